@@ -1,12 +1,2 @@
-# from .barkourball import *
-# from .bong import *
-# from .boodlebump import *
-# from .bummydame import *
-# from .joysticktest import *
-
-from . import barkourball
-from . import bong
-from . import boodlebump
-from . import bummydame
-from . import joysticktest
-
+# Games are not imported here anymore, that would pull in pymunk, cv2, ... before the launcher even shows something.
+# They are listed in bames.toml and imported when selected.
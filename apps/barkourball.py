@@ -5,13 +5,13 @@ from pygame.event import Event
 from pymunk.vec2d import Vec2d
 from lib.bicturemaker import Bicturemaker
 import pymunk
+from lib.bhysics import AdaptiveSubSteps
 from lib.barser import BarserContext, BarserMethod
 from lib.bolygonbetector import BolygonBetector
 import pygame
-from lib.bame import Bame, BameMetadata, BarsedContext, LoadContext, TickContext
+from lib.bame import Bame, BarsedContext, LoadContext, TickContext
 import random
 import pygame.gfxdraw
-import pymunk.autogeometry
 import pygame.font
 import cv2
 
@@ -30,11 +30,13 @@ def debug_img(image, field, context):
     cv2.waitKey(2)
 
 class BarkourBall:
+    # Everything is drawn using the Bicturemaker.
+    supports_dirty_rects = True
 
     barser_context = BarserContext(
-            red_bols = BolygonBetector((170, 127, 127), (10, 255, 255)),
-            green_bols = BolygonBetector((50, 127, 127), (70, 255, 255)),
-            blue_bols = BolygonBetector((110, 127, 127), (130, 255, 255))
+            red_bols = BolygonBetector((170, 127, 127), (10, 255, 255), tile_size=64, decompose=10),
+            green_bols = BolygonBetector((50, 127, 127), (70, 255, 255), tile_size=64, decompose=10),
+            blue_bols = BolygonBetector((110, 127, 127), (130, 255, 255), tile_size=64, decompose=10)
             )
     debugimg = BarserMethod(debug_img)
     barse_red_bolygons = BarserMethod(barse_red_bolygons)
@@ -53,6 +55,8 @@ class BarkourBall:
 
         self.space = pymunk.Space()
         self.space.gravity = (0, -9.81)
+        self.bhysics = context.bhysics
+        self.bhysics.register(self.space, sub_steps=AdaptiveSubSteps(min_steps=2, max_steps=30))
 
         self.__init_objects()
 
@@ -61,10 +65,11 @@ class BarkourBall:
         self.red_lines = []
         self.green_lines = []
         self.blue_lines = []
+        self.lines_layer = self.bicturemaker.layer()
         self.last_updated = None
+        self.barsed_version = None
 
         self.time_won = None
-        self.sub_steps = 20
 
     def tick(self, context: TickContext, barsed_context: BarsedContext):
 
@@ -74,9 +79,6 @@ class BarkourBall:
         if not self.started:
             self.__handle_barsed_context(barsed_context)
 
-        for x in range(self.sub_steps):
-            self.space.step(context.delta_ms / 1000 / self.sub_steps)
-
         self.__check_win()
 
         self.__render()
@@ -109,6 +111,7 @@ class BarkourBall:
         self.ball.position = self.start
         self.ball.velocity = (0, 0)
         self.ball.angular_velocity = 0
+        self.bhysics.teleport(self.ball)
 
         self.space.remove(*self.borders)
 
@@ -145,58 +148,70 @@ class BarkourBall:
     def __handle_barsed_context(self, barsed_context: BarsedContext):
         t = time.time()
 
-        if self.last_updated is None or t - self.last_updated > 1:
+        # Nothing to rebuild if the drawings did not change.
+        if barsed_context.version != self.barsed_version and (self.last_updated is None or t - self.last_updated > 1):
             self.last_updated = t
+            self.barsed_version = barsed_context.version
 
             red_lines = barsed_context.data["red_bolygons"]
             if red_lines is not None:
                 if self.red_lines:
                     self.space.remove(*self.red_lines)
                 self.red_lines = []
-                for line in red_lines:
-                    for convexed_line in pymunk.autogeometry.convex_decomposition(line, 10):
-                        if len(convexed_line) < 4:
-                            continue
-                        parsed_line = []
-                        for point in convexed_line:
-                            parsed_line.append(self.bicturemaker.game2munk(Vec2d(point[0], point[1])))
-                        line_ground = pymunk.Poly(self.space.static_body, parsed_line)
-                        self.space.add(line_ground)
-                        self.red_lines.append(line_ground)
+                for convexed_line in self.bhysics.decompose(red_lines, 10):
+                    if len(convexed_line) < 4:
+                        continue
+                    parsed_line = []
+                    for point in convexed_line:
+                        parsed_line.append(self.bicturemaker.game2munk(Vec2d(point[0], point[1])))
+                    line_ground = pymunk.Poly(self.space.static_body, parsed_line)
+                    self.space.add(line_ground)
+                    self.red_lines.append(line_ground)
 
             green_lines = barsed_context.data["green_bolygons"]
             if green_lines is not None:
                 if self.green_lines:
                     self.space.remove(*self.green_lines)
                 self.green_lines = []
-                for line in green_lines:
-                    for convexed_line in pymunk.autogeometry.convex_decomposition(line, 10):
-                        if len(convexed_line) < 4:
-                            continue
-                        parsed_line = []
-                        for point in convexed_line:
-                            parsed_line.append(self.bicturemaker.game2munk(Vec2d(point[0], point[1])))
-                        line_ground = pymunk.Poly(self.space.static_body, parsed_line)
-                        line_ground.elasticity = 0.99
-                        self.space.add(line_ground)
-                        self.green_lines.append(line_ground)
+                for convexed_line in self.bhysics.decompose(green_lines, 10):
+                    if len(convexed_line) < 4:
+                        continue
+                    parsed_line = []
+                    for point in convexed_line:
+                        parsed_line.append(self.bicturemaker.game2munk(Vec2d(point[0], point[1])))
+                    line_ground = pymunk.Poly(self.space.static_body, parsed_line)
+                    line_ground.elasticity = 0.99
+                    self.space.add(line_ground)
+                    self.green_lines.append(line_ground)
 
             blue_lines = barsed_context.data["blue_bolygons"]
             if blue_lines is not None:
                 if self.blue_lines:
                     self.space.remove(*self.blue_lines)
                 self.blue_lines = []
-                for line in blue_lines:
-                    for convexed_line in pymunk.autogeometry.convex_decomposition(line, 10):
-                        if len(convexed_line) < 4:
-                            continue
-                        parsed_line = []
-                        for point in convexed_line:
-                            parsed_line.append(self.bicturemaker.game2munk(Vec2d(point[0], point[1])))
-                        line_ground = pymunk.Poly(self.space.static_body, parsed_line)
-                        line_ground.friction = 10
-                        self.space.add(line_ground)
-                        self.blue_lines.append(line_ground)
+                for convexed_line in self.bhysics.decompose(blue_lines, 10):
+                    if len(convexed_line) < 4:
+                        continue
+                    parsed_line = []
+                    for point in convexed_line:
+                        parsed_line.append(self.bicturemaker.game2munk(Vec2d(point[0], point[1])))
+                    line_ground = pymunk.Poly(self.space.static_body, parsed_line)
+                    line_ground.friction = 10
+                    self.space.add(line_ground)
+                    self.blue_lines.append(line_ground)
+
+            self.__draw_lines_layer()
+
+    def __draw_lines_layer(self):
+        with self.lines_layer:
+            for line in self.red_lines:
+                self.lines_layer.draw_polygon((63, 0, 0), line)
+
+            for line in self.green_lines:
+                self.lines_layer.draw_polygon((0, 63, 0), line)
+
+            for line in self.blue_lines:
+                self.lines_layer.draw_polygon((0, 0, 63), line)
 
     def __check_win(self):
         t = time.time()
@@ -213,19 +228,12 @@ class BarkourBall:
 
     def __render(self):
 
-        self.bicturemaker.draw_filled_circle(self.ball.position, self.ball_radius, (255,255, 255))
+        self.bicturemaker.draw_filled_circle(self.bhysics.position(self.ball), self.ball_radius, (255,255, 255))
 
         for border in self.borders:
             self.bicturemaker.draw_line((255, 0, 0), border.a, border.b)
 
-        for line in self.red_lines:
-            self.bicturemaker.draw_polygon((63, 0, 0), line)
-
-        for line in self.green_lines:
-            self.bicturemaker.draw_polygon((0, 63, 0), line)
-
-        for line in self.blue_lines:
-            self.bicturemaker.draw_polygon((0, 0, 63), line)
+        self.bicturemaker.draw_layer(self.lines_layer)
 
     def __set_borders(self, point: Vec2d):
         left_top = point + (-self.ball_radius - 0.1, 0)
@@ -248,7 +256,6 @@ class BarkourBall:
         self.borders.append(bottom)
         return left, right, bottom
 
-bame_metadata = BameMetadata(name="Barkour Ball", clazz=BarkourBall)
 
 if __name__ == '__main__':
     Bame(BarkourBall).run()
@@ -8,10 +8,9 @@ import pymunk
 from lib.barser import BarserContext, BarserMethod
 from lib.bolygonbetector import BolygonBetector
 import pygame
-from lib.bame import Bame, BameMetadata, BarsedContext, LoadContext, TickContext
+from lib.bame import Bame, BarsedContext, LoadContext, TickContext
 import random
 import pygame.gfxdraw
-import pymunk.autogeometry
 import pygame.font
 
 
@@ -20,8 +19,10 @@ def barse_red_bolygons(image, field, context):
 
 
 class Bong:
+    # Everything is drawn using the Bicturemaker.
+    supports_dirty_rects = True
     barser_context = BarserContext(
-        bols = BolygonBetector((170, 127, 127), (10, 255, 255))
+        bols = BolygonBetector((170, 127, 127), (10, 255, 255), tile_size=64, decompose=10)
             )
 
     barse_red_lines = BarserMethod(barse_red_bolygons)
@@ -43,6 +44,8 @@ class Bong:
         self.bicturemaker.set_scale(1/20)
 
         self.space = pymunk.Space()
+        self.bhysics = context.bhysics
+        self.bhysics.register(self.space, before_step=self.__handle_physics)
 
         self.__init_objects()
 
@@ -54,7 +57,9 @@ class Bong:
         self.right_down = False
 
         self.drawn_lines = []
+        self.lines_layer = self.bicturemaker.layer()
         self.last_updated = None
+        self.barsed_version = None
 
     def tick(self, context: TickContext, barsed_context: BarsedContext):
 
@@ -63,10 +68,6 @@ class Bong:
 
         self.__handle_barsed_context(barsed_context)
 
-        self.__handle_physics()
-
-        self.space.step(context.delta_ms / 1000)
-
         self.__check_win()
 
         self.__render()
@@ -130,6 +131,8 @@ class Bong:
 
         self.left_box.position = self.left_box_position_init
         self.right_box.position = self.right_box_position_init
+        for body in (self.ball, self.left_box, self.right_box):
+            self.bhysics.teleport(body)
 
     def __handle_events(self, context: TickContext):
 
@@ -158,28 +161,33 @@ class Bong:
     def __handle_barsed_context(self, barsed_context: BarsedContext):
         t = time.time()
 
-        if self.last_updated is None or t - self.last_updated > 1:
+        # Nothing to rebuild if the drawings did not change.
+        if barsed_context.version != self.barsed_version and (self.last_updated is None or t - self.last_updated > 1):
             self.last_updated = t
+            self.barsed_version = barsed_context.version
 
             drawn_lines = barsed_context.data["red_bolygons"]
             if drawn_lines is not None:
                 if self.drawn_lines:
                     self.space.remove(*self.drawn_lines)
                 self.drawn_lines = []
-                for line in drawn_lines:
-                    for convexed_line in pymunk.autogeometry.convex_decomposition(line, 10):
-                        if len(convexed_line) < 4:
-                            continue
-                        parsed_line = []
-                        for point in convexed_line:
-                            parsed_line.append(self.bicturemaker.game2munk(Vec2d(point[0], point[1])))
-                        line_ground = pymunk.Poly(self.space.static_body, parsed_line)
-                        line_ground.friction = 0.3
-                        line_ground.elasticity = 1
-                        self.space.add(line_ground)
-                        self.drawn_lines.append(line_ground)
-
-    def __handle_physics(self):
+                for convexed_line in self.bhysics.decompose(drawn_lines, 10):
+                    if len(convexed_line) < 4:
+                        continue
+                    parsed_line = []
+                    for point in convexed_line:
+                        parsed_line.append(self.bicturemaker.game2munk(Vec2d(point[0], point[1])))
+                    line_ground = pymunk.Poly(self.space.static_body, parsed_line)
+                    line_ground.friction = 0.3
+                    line_ground.elasticity = 1
+                    self.space.add(line_ground)
+                    self.drawn_lines.append(line_ground)
+
+                with self.lines_layer:
+                    for line in self.drawn_lines:
+                        self.lines_layer.draw_polygon((63, 0, 0), line)
+
+    def __handle_physics(self, dt):
 
         if self.ball.velocity.x < self.ball_min_x_velocity and self.ball.velocity.x >= 0:
             self.ball.velocity = (self.ball_min_x_velocity, self.ball.velocity.y)
@@ -199,22 +207,20 @@ class Bong:
     def __render(self):
         self.bicturemaker.draw_line((255, 255, 0), self.top.a, self.top.b)
         self.bicturemaker.draw_line((255, 255, 0), self.bottom.a, self.bottom.b)
-        self.bicturemaker.draw_filled_circle(self.ball.position, self.ball_radius, (0, 255, 0))
-        left_box_topleft = self.left_box.position + Vec2d(-self.left_box_size.x / 2, self.left_box_size.y / 2)
+        self.bicturemaker.draw_filled_circle(self.bhysics.position(self.ball), self.ball_radius, (0, 255, 0))
+        left_box_topleft = self.bhysics.position(self.left_box) + Vec2d(-self.left_box_size.x / 2, self.left_box_size.y / 2)
         left_box_bottomright = left_box_topleft + Vec2d(self.left_box_size.x, -self.left_box_size.y)
         self.bicturemaker.draw_rect((255, 255, 0), left_box_topleft, left_box_bottomright, border_radius=self.left_box_radius)
-        right_box_topleft = self.right_box.position + Vec2d(-self.right_box_size.x / 2, self.right_box_size.y / 2)
+        right_box_topleft = self.bhysics.position(self.right_box) + Vec2d(-self.right_box_size.x / 2, self.right_box_size.y / 2)
         right_box_bottomright = right_box_topleft + Vec2d(self.right_box_size.x, -self.right_box_size.y)
         self.bicturemaker.draw_rect((255, 255, 0), right_box_topleft, right_box_bottomright, border_radius=self.right_box_radius)
 
-        for line in self.drawn_lines:
-            self.bicturemaker.draw_polygon((63, 0, 0), line)
+        self.bicturemaker.draw_layer(self.lines_layer)
 
         text = self.font.render(str(self.goals_left) + " - " + str(self.goals_right), False, (255, 255, 255))
 
         self.bicturemaker.draw_text(text, self.text_position)
 
-bame_data = BameMetadata(name="Bong", clazz=Bong, players=2)
 
 if __name__ == '__main__':
     Bame(Bong).run()
@@ -5,17 +5,17 @@ from lib.bectangleretector import BectangleRetector, rect_to_verts
 from lib import bamepad
 from lib.bicturemaker import Bicturemaker
 from lib.bolygonbetector import BolygonBetector
+from lib.bhysics import AdaptiveSubSteps
 
 import pygame.transform
 import pygame.draw
 import numpy as np
 from lib.barser import BarserContext, BarserMethod
 import pymunk
-from lib.bame import Bame, BameMetadata, BarsedContext, LoadContext, TickContext
+from lib.bame import Bame, BarsedContext, LoadContext, TickContext
 import pygame
 import cv2
 import time
-import pymunk.autogeometry
 
 
 
@@ -29,14 +29,18 @@ def barse_blue_rectangles(image, field, context):
 
 
 class BoodleBump:
+    # Everything is drawn using the Bicturemaker.
+    supports_dirty_rects = True
+    assets = ["img/Boodle.png"]
 
     barser_context = BarserContext(
-            bols = BolygonBetector((170, 127, 127), (10, 255, 255)),
+            bols = BolygonBetector((170, 127, 127), (10, 255, 255), tile_size=64, decompose=10),
             rects = BectangleRetector((110, 127, 127), (130, 255, 255))
             )
 
     barse_red_lines = BarserMethod(barse_red_bolygons)
-    barse_blue_rectangles = BarserMethod(barse_blue_rectangles)
+    # The KalmanRects need every frame to follow a moving rectangle.
+    barse_blue_rectangles = BarserMethod(barse_blue_rectangles, every_frame=True)
 
     def load(self, context: LoadContext) -> None:
 
@@ -54,7 +58,9 @@ class BoodleBump:
         self.space.iterations = 10
         self.space.idle_speed_threshold = 0.0000001
         self.space.gravity = (0, -9.81)
-        self.sub_steps = 20
+        self.bhysics = context.bhysics
+        self.bassets = context.bassets
+        self.bhysics.register(self.space, sub_steps=AdaptiveSubSteps(min_steps=2, max_steps=30))
         
         self.__init_objects()
 
@@ -62,8 +68,10 @@ class BoodleBump:
         self.right_held = False
 
         self.red_lines = []
+        self.lines_layer = self.bicturemaker.layer()
         self.blue_rectangles = []
         self.last_updated = None
+        self.barsed_version = None
         self.time_won = None
         
     def tick(self, context: TickContext, barsed_context: BarsedContext):
@@ -75,11 +83,6 @@ class BoodleBump:
         if self.__handle_events(context):
             return True
         
-        #Simulation
-        sub_step_stuff = context.delta_ms / 1000 / self.sub_steps
-        for _ in range(self.sub_steps):
-            self.space.step(sub_step_stuff)
-
         self.__check_win()
 
         self.__render()
@@ -89,7 +92,7 @@ class BoodleBump:
         self.ground.friction = 1
         self.space.add(self.ground)
 
-        self.boodle_sprite = pygame.transform.scale(pygame.image.load("img/Boodle.png"), (96, 96))
+        self.boodle_sprite = self.bassets.get("img/Boodle.png", (96, 96), alpha=True)
         boodle_mass = 1
         self.boodle_size = Vec2d(1, 1)
         boodle_moment = pymunk.moment_for_box(1, self.boodle_size)
@@ -105,6 +108,7 @@ class BoodleBump:
         self.boodle.angle = 0
         self.boodle.velocity = (0, 0)
         self.boodle.angular_velocity = 0
+        self.bhysics.teleport(self.boodle)
 
     def __handle_events(self, context: TickContext):
 
@@ -132,25 +136,30 @@ class BoodleBump:
     def __handle_barsed_context(self, barsed_context: BarsedContext):
         t = time.time()
 
-        if self.last_updated is None or t - self.last_updated > 1:
+        # Nothing to rebuild if the drawings did not change.
+        if barsed_context.version != self.barsed_version and (self.last_updated is None or t - self.last_updated > 1):
             self.last_updated = t
+            self.barsed_version = barsed_context.version
 
             red_lines = barsed_context.data["red_bolygons"]
             if red_lines is not None:
                 if self.red_lines:
                     self.space.remove(*self.red_lines)
                 self.red_lines = []
-                for line in red_lines:
-                    for convexed_line in pymunk.autogeometry.convex_decomposition(line, 10):
-                        if len(convexed_line) < 4:
-                            continue
-                        parsed_line = []
-                        for point in convexed_line:
-                            parsed_line.append(self.bicturemaker.game2munk(point))
-                        line_ground = pymunk.Poly(self.space.static_body, parsed_line)
-                        line_ground.friction = 1
-                        self.space.add(line_ground)
-                        self.red_lines.append(line_ground)
+                for convexed_line in self.bhysics.decompose(red_lines, 10):
+                    if len(convexed_line) < 4:
+                        continue
+                    parsed_line = []
+                    for point in convexed_line:
+                        parsed_line.append(self.bicturemaker.game2munk(point))
+                    line_ground = pymunk.Poly(self.space.static_body, parsed_line)
+                    line_ground.friction = 1
+                    self.space.add(line_ground)
+                    self.red_lines.append(line_ground)
+
+                with self.lines_layer:
+                    for line in self.red_lines:
+                        self.lines_layer.draw_polygon((63, 0, 0), line)
 
         self.blue_rectangles = barsed_context.data["blue_rectangles"]
 
@@ -168,15 +177,14 @@ class BoodleBump:
     def __render(self):
         self.bicturemaker.draw_line((255, 0, 255), self.ground.a, self.ground.b)
 
-        for line in self.red_lines:
-            self.bicturemaker.draw_polygon((63, 0, 0), line)
+        self.bicturemaker.draw_layer(self.lines_layer)
 
         for rectangle in self.blue_rectangles:
             self.bicturemaker.draw_polygon_from_game_vertices((0, 0, 63), rect_to_verts(rectangle))
 
-        rotation = self.boodle.rotation_vector
+        rotation = Vec2d(1, 0).rotated(self.bhysics.angle(self.boodle))
 
-        self.bicturemaker.draw_sprite(self.boodle_sprite, self.boodle.position, rotation)
+        self.bicturemaker.draw_sprite(self.boodle_sprite, self.bhysics.position(self.boodle), rotation)
 
     def __is_well_grounded(self):
         grounding = {
@@ -1,6 +1,6 @@
 from lib.bectangleretector import BectangleRetector, rect_to_verts
 import numpy as np
-from lib.bame import BameMetadata, BarsedContext, LoadContext
+from lib.bame import BarsedContext, LoadContext
 from lib import Bame, TickContext, barameters
 import pygame
 from pygame.surface import Surface
@@ -27,6 +27,7 @@ def rot_center(image, angle):
     return rot_sprite
 
 class BummyDame:
+    assets = ["img/flowo.png"]
 
     barser_context = BarserContext(
             bects = BectangleRetector(None, None)
@@ -36,9 +37,10 @@ class BummyDame:
         print("FONT INIT:")
         self.bicturemaker = context.bicturemaker
         self.font = pygame.font.SysFont(None, 24)
-        self.flowo = pygame.image.load("img/flowo.png")
+        self.flowo = context.bassets.get("img/flowo.png", alpha=True)
     
-    barse_squares = BarserMethod(barse_squares)
+    # The KalmanRects need every frame to follow a moving rectangle.
+    barse_squares = BarserMethod(barse_squares, every_frame=True)
     # debug_image = BarserMethod(debug_image)
 
     def tick(self, context: TickContext, barsed_context: BarsedContext):
@@ -68,7 +70,6 @@ class BummyDame:
         textimg = self.font.render(f'Age: {barsed_context.age}', True, (255, 255, 255))
         context.screen.blit(textimg, (shape[0]/2, shape[1]/2))
 
-bame_data = BameMetadata(name="Bummy dame", clazz=BummyDame)
 
 if __name__ == '__main__':
     Bame(BummyDame).run()
@@ -1,8 +1,10 @@
-from lib.bame import Bame, BameMetadata, BarsedContext, LoadContext, TickContext
+from lib.bame import Bame, BarsedContext, LoadContext, TickContext
 from lib import bamepad
 import pygame
 
 class JoyStickTest:
+    assets = ["img/flowo.png"]
+
     def load(self, context: LoadContext) -> None:
         print("FONT INIT:")
 
@@ -12,7 +14,7 @@ class JoyStickTest:
         context.beymap_registrar.add_action("SPEED", bamepad.AXIS_LEFT_HORIZONTAL)
 
         self.font = pygame.font.SysFont(None, 24)
-        self.flowo = pygame.image.load("img/flowo.png")
+        self.flowo = context.bassets.get("img/flowo.png", alpha=True)
         self.values = {}
     
     def tick(self, context: TickContext, barsed_context: BarsedContext):
@@ -33,7 +35,6 @@ class JoyStickTest:
                 # print(event)
                 self.values[f"{event.player} - {event.control_name}"]=event.value
 
-joystick_test = BameMetadata(name="Joystick Test", clazz=JoyStickTest)
 
 if __name__ == '__main__':
     Bame(JoyStickTest).run()
@@ -0,0 +1,65 @@
+"""
+Checks the tiled BolygonBetector against the full-frame one.
+
+Random red strokes and blobs are drawn (and some erased) on a 960x540 frame, after every edit the frame is shown
+for a while without changes. Small edits are missed by the change detection on purpose. Once change_refresh
+passed, the tiled mask and contours have to be the same as the ones of a full findContours.
+
+    python bench/tiled_bolygons.py
+"""
+import os
+import random
+import sys
+import time
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from lib.bolygonbetector import BolygonBetector
+
+LOWER = (170, 127, 127)
+HIGHER = (10, 255, 255)
+REFRESH = 0.2
+
+
+def contours(betector: BolygonBetector):
+    return sorted((rect, contour.tobytes() if contour is not None else None) for (rect, contour) in betector.contours)
+
+
+def edit(image: np.ndarray, rng: random.Random):
+    (height, width) = image.shape[:2]
+    (x, y) = (rng.randrange(width), rng.randrange(height))
+    colour = (0, 0, 255) if rng.random() < 0.7 else (200, 200, 200)
+    kind = rng.random()
+    if kind < 0.4:
+        cv2.line(image, (x, y), (x + rng.randint(-200, 200), y + rng.randint(-200, 200)), colour, rng.randint(2, 8))
+    elif kind < 0.8:
+        # Small blobs (about 36 px) stay below the threshold of a 64x64 block.
+        cv2.circle(image, (x, y), rng.randint(2, 4), colour, -1)
+    else:
+        cv2.rectangle(image, (x, y), (x + rng.randint(10, 80), y + rng.randint(10, 80)), colour, -1)
+
+
+def main(edits: int = 40, seed: int = 1) -> bool:
+    rng = random.Random(seed)
+    image = np.full((540, 960, 3), 200, dtype=np.uint8)
+    tiled = BolygonBetector(LOWER, HIGHER, tile_size=64, change_refresh=REFRESH)
+    full = BolygonBetector(LOWER, HIGHER)
+    mismatches = 0
+    for i in range(edits):
+        edit(image, rng)
+        started = time.time()
+        while time.time() - started < REFRESH * 1.5:
+            tiled.betect(image)
+            time.sleep(0.01)
+        full.betect(image)
+        mask_differs = int(np.count_nonzero(tiled.mask != full.mask))
+        if mask_differs or contours(tiled) != contours(full):
+            mismatches += 1
+            print(f"Edit {i}: {mask_differs} mask pixels differ, {len(tiled.contours)} tiled vs {len(full.contours)} full contours")
+    print(f"{edits - mismatches}/{edits} edits match after {REFRESH}s, {tiled.bhange.report()}")
+    return mismatches == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
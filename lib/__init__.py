@@ -1,3 +1,5 @@
+from .util.startup import PROFILER
 from .bame import Bame, TickContext
 from .beymap import BeymapManager, BeymapRegistrar
 from .bamepad import BamePadManager
+PROFILER.mark("lib imported")
@@ -0,0 +1,100 @@
+import time
+from typing import Optional
+
+
+class Bacer:
+    """
+    Frame pacing for the render loop.
+
+    Modes:
+        vsync: Do not wait at all, display.flip() blocks until the next refresh.
+        fps: Wait until the next frame is due. Sleeps for most of the time and busy-waits for the last few
+             milliseconds, as sleep() alone oversleeps by up to a few ms depending on the OS.
+        uncapped: Do not wait at all. Useful for benchmarks.
+
+    Frames which took longer than their budget are counted as late. The budget is 1/target_fps, except with vsync:
+    there it is the refresh interval of the display (see set_refresh_rate), which is what flip() actually paces to.
+    """
+
+    VSYNC = "vsync"
+    FPS = "fps"
+    UNCAPPED = "uncapped"
+    MODES = [VSYNC, FPS, UNCAPPED]
+
+    def __init__(self, mode: str = FPS, target_fps: float = 60, busy_wait_ms: float = 2) -> None:
+        if mode not in Bacer.MODES:
+            raise Exception(f"Unknown frame pacing '{mode}'. Use one of {Bacer.MODES}.")
+        self.mode = mode
+        self.frame_time = 1 / target_fps
+        self.refresh_time = self.frame_time
+        self.busy_wait = busy_wait_ms / 1000
+        self.last_tick = None
+        self.deadline = None
+
+        self.frames = 0
+        self.late_frames = 0
+        self.worst_late_ms = 0.0
+        self.total_late_ms = 0.0
+
+    def set_refresh_rate(self, refresh_rate: Optional[float]):
+        """
+        Refresh rate (Hz) of the display, for vsync. None or 0 if it is unknown, then target_fps is used instead.
+        """
+        if refresh_rate:
+            self.refresh_time = 1 / refresh_rate
+        else:
+            print(f"Refresh rate of the display unknown, measuring late frames against {1 / self.frame_time:.0f}fps.")
+            self.refresh_time = self.frame_time
+
+    def tick(self) -> float:
+        """
+        Call once per frame (after flipping). Waits according to the mode and returns the milliseconds since the last call.
+        """
+        now = time.perf_counter()
+        if self.last_tick is None:
+            self.last_tick = now
+            self.deadline = now + self.frame_time
+            return self.frame_time * 1000
+
+        if self.mode == Bacer.FPS:
+            now = self.__wait_for_deadline(now)
+        elif self.mode == Bacer.VSYNC:
+            # Missing a refresh means the frame stayed on the screen for (at least) two refreshes.
+            late = (now - self.last_tick) - self.refresh_time * 1.5
+            if late > 0:
+                self.__count_late(late + self.refresh_time * 0.5)
+
+        delta = now - self.last_tick
+        self.last_tick = now
+        self.frames += 1
+        return delta * 1000
+
+    def __wait_for_deadline(self, now: float) -> float:
+        late = now - self.deadline
+        if late > 0:
+            self.__count_late(late)
+            # Do not try to catch up, otherwise the next frames would be rushed.
+            self.deadline = now + self.frame_time
+            return now
+
+        sleep_time = self.deadline - now - self.busy_wait
+        if sleep_time > 0:
+            time.sleep(sleep_time)
+        while now < self.deadline:
+            now = time.perf_counter()
+
+        self.deadline += self.frame_time
+        return now
+
+    def __count_late(self, late: float):
+        late_ms = late * 1000
+        self.late_frames += 1
+        self.total_late_ms += late_ms
+        self.worst_late_ms = max(self.worst_late_ms, late_ms)
+
+    def report(self) -> str:
+        if self.frames == 0:
+            return f"<Bacer({self.mode}) no frames>"
+        return (f"<Bacer({self.mode}) frames={self.frames} late={self.late_frames} "
+                f"({self.late_frames / self.frames * 100:.1f}%) "
+                f"avg_late={self.total_late_ms / max(self.late_frames, 1):.2f}ms worst_late={self.worst_late_ms:.2f}ms>")
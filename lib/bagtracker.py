@@ -0,0 +1,215 @@
+from typing import Dict, Iterable, List, Sequence, Tuple
+import cv2
+import numpy as np
+
+# tag16h5 is 8 cells wide (6 data + black border). Below ~3 pixels per cell (after decimation) detection gets flaky.
+MIN_TAG_PIXELS = 24
+DECIMATIONS = [4.0, 3.0, 2.0, 1.5, 1.0]
+
+
+def set_quad_decimate(detector, quad_decimate: float):
+    detector.tag_detector_ptr.contents.quad_decimate = float(quad_decimate)
+
+
+def get_quad_decimate(detector) -> float:
+    return detector.tag_detector_ptr.contents.quad_decimate
+
+
+def tag_pixel_size(detections: Sequence) -> float:
+    """
+    Length of the shortest tag edge in pixels, i.e. the size of the smallest (or most skewed) tag.
+    """
+    size = float("inf")
+    for detection in detections:
+        corners = np.asarray(detection.corners)
+        edges = np.roll(corners, -1, axis=0) - corners
+        size = min(size, float(np.min(np.linalg.norm(edges, axis=1))))
+    return size
+
+
+def tune_quad_decimate(detector, gray: np.ndarray, tag_ids: Iterable[int], tag_size: float, *, min_tag_pixels: float = MIN_TAG_PIXELS) -> float:
+    """
+    Picks the largest decimation which keeps the tags at least `min_tag_pixels` big and which still finds all tags
+    in `gray`. Leaves the detector set to it and returns it.
+    tag_size: Size of the tags in pixels, see tag_pixel_size.
+    """
+    wanted = set(tag_ids)
+    candidates = [d for d in DECIMATIONS if tag_size / d >= min_tag_pixels] or [DECIMATIONS[-1]]
+    for quad_decimate in candidates:
+        set_quad_decimate(detector, quad_decimate)
+        if wanted <= {detection.tag_id for detection in detector.detect(gray)}:
+            return quad_decimate
+    set_quad_decimate(detector, candidates[-1])
+    return candidates[-1]
+
+
+def refine_corners(gray: np.ndarray, detection, tag_size: float):
+    """
+    Moves the corners of a (decimated) detection to sub-pixel accuracy using the full resolution image.
+    cornerSubPix only looks at a small window around every corner, so this costs next to nothing.
+    """
+    window = int(max(2, min(tag_size / 8, 10)))
+    corners = np.asarray(detection.corners, dtype=np.float32).reshape(-1, 1, 2)
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 20, 0.01)
+    cv2.cornerSubPix(gray, corners, (window, window), (-1, -1), criteria)
+    detection.corners = corners.reshape(4, 2).astype(np.float64)
+    # The center is the intersection of the diagonals.
+    (p0, p1, p2, p3) = detection.corners
+    d1 = p2 - p0
+    d2 = p3 - p1
+    denominator = d1[0] * d2[1] - d1[1] * d2[0]
+    if denominator != 0:
+        u = ((p1[0] - p0[0]) * d2[1] - (p1[1] - p0[1]) * d2[0]) / denominator
+        detection.center = p0 + u * d1
+
+
+class TrackedTag:
+    """
+    Last known state of one tag. Positions are in pixels of the full camera image.
+    """
+    def __init__(self, detection, t: float) -> None:
+        self.detection = detection
+        self.center = np.array(detection.center, dtype=np.float64)
+        self.velocity = np.zeros(2)
+        self.seen = t
+        self.misses = 0
+
+    def update(self, detection, t: float):
+        center = np.array(detection.center, dtype=np.float64)
+        dt = t - self.seen
+        if dt > 0:
+            # Smoothed, a single bad detection should not throw the next window off.
+            self.velocity = 0.5 * self.velocity + 0.5 * (center - self.center) / dt
+        self.detection = detection
+        self.center = center
+        self.seen = t
+        self.misses = 0
+
+    def predicted_offset(self, t: float) -> np.ndarray:
+        return self.velocity * (t - self.seen)
+
+
+class TagTracker:
+    """
+    Finds the tags with as little detection work as possible:
+
+    1. Every known tag is searched in a window around where it is predicted to be (last position + velocity * dt).
+       The window grows with the speed of the tag and with every frame it was missed. Tags which were missed
+       `max_misses` times in a row are forgotten and only searched in the full frame again.
+    2. Tags not found in their window are retried once in a window twice as big.
+    3. Only if some tags are still missing (or were never seen), the whole frame is searched and only the missing
+       tags are taken from that result. This search is decimated by the detector's quad_decimate, `full_frame_scale`
+       additionally downscales the image before.
+
+    When the projection does not move only step 1 runs, which is a few tiny detections per frame.
+
+    With `refine=True` the corners of every detection are refined on the full resolution image afterwards, so the
+    detector can run decimated (coarse) while the corners stay accurate (fine).
+    """
+
+    tags: Dict[int, TrackedTag]
+
+    def __init__(self, detector, tag_ids: Iterable[int], *, margin: int = 10, full_frame_scale: float = 1, max_misses: int = 5, refine: bool = True) -> None:
+        """
+        detector: pupil_apriltags.Detector
+        margin: Pixels added around the predicted bounding box of a tag.
+        full_frame_scale: Scale of the image for the full frame search. 1 leaves the decimation to the detector.
+        """
+        self.detector = detector
+        self.tag_ids = list(tag_ids)
+        self.margin = margin
+        self.full_frame_scale = full_frame_scale
+        self.max_misses = max_misses
+        self.refine = refine
+        self.tags = {}
+
+        self.frames = 0
+        self.full_detects = 0
+        self.window_detects = 0
+        self.retries = 0
+
+    def track(self, gray: np.ndarray, t: float) -> List:
+        """
+        Returns the detections (pupil_apriltags.Detection, in full image coordinates) of the tags which were found.
+        """
+        self.frames += 1
+        found = {}
+        for (tag_id, tag) in self.tags.items():
+            detection = self.__detect_in_window(gray, tag, t, 1)
+            if detection is None:
+                self.retries += 1
+                detection = self.__detect_in_window(gray, tag, t, 2)
+            if detection is not None:
+                found[tag_id] = detection
+
+        missing = [tag_id for tag_id in self.tag_ids if tag_id not in found]
+        if missing:
+            self.full_detects += 1
+            for detection in self.__detect_full_frame(gray):
+                if detection.tag_id in missing and detection.tag_id not in found:
+                    found[detection.tag_id] = detection
+
+        if self.refine:
+            for detection in found.values():
+                refine_corners(gray, detection, tag_pixel_size([detection]))
+
+        for tag_id in self.tag_ids:
+            if tag_id in found:
+                if tag_id in self.tags:
+                    self.tags[tag_id].update(found[tag_id], t)
+                else:
+                    self.tags[tag_id] = TrackedTag(found[tag_id], t)
+            elif tag_id in self.tags:
+                self.tags[tag_id].misses += 1
+                if self.tags[tag_id].misses > self.max_misses:
+                    del self.tags[tag_id]
+
+        return list(found.values())
+
+    def window(self, shape: Tuple[int, ...], tag: TrackedTag, t: float, grow: float) -> Tuple[int, int, int, int]:
+        """
+        (x1, y1, x2, y2) around the predicted position of the tag, clamped to the image.
+        """
+        offset = tag.predicted_offset(t)
+        corners = np.asarray(tag.detection.corners) + offset
+        padding = (self.margin + np.abs(offset)) * grow * (1 + tag.misses)
+        (x1, y1) = corners.min(axis=0) - padding
+        (x2, y2) = corners.max(axis=0) + padding
+        height, width = shape[0], shape[1]
+        return (
+            int(min(max(x1, 0), width)),
+            int(min(max(y1, 0), height)),
+            int(min(max(x2, 0), width)),
+            int(min(max(y2, 0), height)),
+        )
+
+    def __detect_in_window(self, gray: np.ndarray, tag: TrackedTag, t: float, grow: float):
+        (x1, y1, x2, y2) = self.window(gray.shape, tag, t, grow)
+        if x2 - x1 < 8 or y2 - y1 < 8:
+            return None
+        self.window_detects += 1
+        tag_id = tag.detection.tag_id
+        for detection in self.detector.detect(np.ascontiguousarray(gray[y1:y2, x1:x2])):
+            if detection.tag_id == tag_id:
+                detection.corners += (x1, y1)
+                detection.center += (x1, y1)
+                return detection
+        return None
+
+    def __detect_full_frame(self, gray: np.ndarray) -> List:
+        if self.full_frame_scale == 1:
+            return self.detector.detect(gray)
+        small = cv2.resize(gray, None, fx=self.full_frame_scale, fy=self.full_frame_scale, interpolation=cv2.INTER_AREA)
+        detections = self.detector.detect(small)
+        for detection in detections:
+            detection.corners /= self.full_frame_scale
+            detection.center /= self.full_frame_scale
+        return detections
+
+    @property
+    def full_detect_rate(self) -> float:
+        return self.full_detects / self.frames if self.frames else 0.0
+
+    def report(self) -> str:
+        return (f"<TagTracker frames={self.frames} full_detects={self.full_detects} ({self.full_detect_rate * 100:.1f}%) "
+                f"window_detects={self.window_detects} retries={self.retries}>")
@@ -1,63 +1,134 @@
 import ctypes
+import importlib
+import toml
 from lib import barameters
 from lib.beymap import BeymapManager, BeymapRegistrar
-from lib.bamepad import BUTTON_SYMBOL_BOTTOM, BUTTON_SYMBOL_TOP, BamePadFactory, BamePadManager, Bvent, MENU_RIGHT
+from lib.bamepad import BUTTON_SYMBOL_BOTTOM, BUTTON_SYMBOL_TOP, BamePadFactory, BamePadManager, Bvent, MENU_RIGHT, load_maps
+import math
 import os
-from time import time
+import threading
+from time import perf_counter, time
 
 from pygame.event import Event
 from lib.bicturemaker import Bicturemaker
-from lib.bicturetaker import Bicturetaker
+from lib.bhysics import Bhysics
+from lib.bassets import Bassets
+from lib.bacer import Bacer
+from lib.birtyrects import BirtyRects
+from lib.batency import BatencyMeter, BventInjector
 from lib.barameters import Barameters
 from typing import Optional, Tuple, Type, Any, List, Dict, Union
 import pygame
 from .util.keyframes import Keyframes
-from .barser import Barser, BarserOptions
-import numpy as np
-import cv2
+from .util.startup import PROFILER
+from .util.bench import write_bench
+
+# Imported in the background while the splash screen is shown (see Bame.run). They are only needed once the
+# camera is opened, importing them up front doubled the time until the first frame.
+HEAVY_MODULES = ["numpy", "cv2", "lib.bicturetaker", "lib.barser"]
 
 class BameMetadata:
-    def __init__(self, *, name: str, clazz: Type, players: Union[int, None] = None) -> None:
+    """
+    Describes a game. Either pass the class directly or the module and class name, then the module is only imported
+    when the class is needed (see BameMetadata.from_manifest).
+    """
+    def __init__(self, *, name: str, clazz: Optional[Type] = None, players: Union[int, None] = None, module: Optional[str] = None, clazz_name: Optional[str] = None) -> None:
+        if clazz is None and (module is None or clazz_name is None):
+            raise Exception(f"BameMetadata {name} needs either a clazz or a module and clazz_name.")
         self.name = name
         self.players = players
-        self.clazz = clazz
+        self.module = module if clazz is None else clazz.__module__
+        self.clazz_name = clazz_name if clazz is None else clazz.__name__
+        self.__clazz = clazz
+
+    @property
+    def clazz(self) -> Type:
+        if self.__clazz is None:
+            print(f"Importing {self.module}...")
+            self.__clazz = getattr(importlib.import_module(self.module), self.clazz_name)
+        return self.__clazz
+
+    @staticmethod
+    def from_manifest(path: str) -> List["BameMetadata"]:
+        """
+        Reads the [[bame]] entries (name, module, clazz, players) of a toml manifest without importing anything.
+        """
+        manifest = toml.load(path)
+        return [
+                BameMetadata(name=entry["name"], module=entry["module"], clazz_name=entry["clazz"], players=entry.get("players"))
+                for entry in manifest["bame"]
+            ]
     
     def __str__(self) -> str:
-        return f"<BameMetadata(name=${self.name} clazz={self.clazz})>"
+        return f"<BameMetadata(name=${self.name} clazz={self.module}.{self.clazz_name})>"
 
 class LoadContext:
     bicturemaker: Bicturemaker
     beymap_registrar: BeymapRegistrar
+    bhysics: Bhysics
+    bassets: Bassets
 
 class SceneLoadContext:
     bicturemaker: Bicturemaker
     beymap_registrar: BeymapRegistrar
+    bhysics: Bhysics
+    bassets: Bassets
 
 class BarsedContext:
     data: Dict
     age: float
     image: Any
+    # Counts up whenever data changed, see BarsedWithTime. Only rebuild things from data when it differs from the last one.
+    version: int
 
 class TickContext:
     fps: float
-    delta_ms: int
+    delta_ms: float
     screen: Any
     barameters: Barameters
     bamepads: BamePadManager
     beymap: BeymapManager
     bicturemaker: Bicturemaker
+    bhysics: Bhysics
+    bassets: Bassets
+    # Only set if the dirty-rect mode is active for the current scene, mark everything you draw there.
+    dirty: Optional[BirtyRects]
 
     events: List[Event]
     bvents: List[Bvent]
 
+def tag_ids(settings: Barameters) -> List[int]:
+    return [tag_id for camera in settings.cameras for tag_id in camera["tags"]]
+
+def tag_paths(settings: Barameters) -> List[str]:
+    return ["img/" + str(tag_id) + ".png" for tag_id in tag_ids(settings)]
+
+def load_tags(bassets: Bassets, settings: Barameters) -> Dict[int, Any]:
+    size = (settings.tag_size, settings.tag_size)
+    return { tag_id: bassets.get(path, size) for (tag_id, path) in zip(tag_ids(settings), tag_paths(settings)) }
+
+def tag_blits(tags: Dict[int, Any], settings: Barameters) -> List[Tuple[Any, Tuple[int, int]]]:
+    """
+    The tags of every camera in the corners of its region (bottom left, bottom right, top right, top left).
+    """
+    size = settings.tag_size
+    blits = []
+    for camera in settings.cameras:
+        (x, y, w, h) = camera["region"]
+        corners = [(x, y + h - size), (x + w - size, y + h - size), (x + w - size, y), (x, y)]
+        blits += [(tags[tag_id], corner) for (tag_id, corner) in zip(camera["tags"], corners)]
+    return blits
+
 class SplashScene:
+    # Scenes (and games) list the images they need, so the engine can prefetch them while the scene before is running.
+    assets = ["img/Logo.jpg"]
+
     def __init__(self, _: "Bame"):
-        self.splash_img = pygame.image.load("img/Logo.jpg")
         self.frames = Keyframes([(0, 0), (0.5, 255), (1.3, 255), (1.5, 0)])
 
 
     def load(self, context: SceneLoadContext):
-        pass
+        self.splash_img = context.bassets.get("img/Logo.jpg")
 
     def tick(self, context: TickContext) -> bool:
         self.frames.advance(context.delta_ms/1000)
@@ -70,17 +141,136 @@ class SplashScene:
     def unload(self):
         pass
 
+class TransitionScene:
+    """
+    Shown by the engine while the SceneLoader unloads the old and prepares the next scene in the background.
+    Only draws with pygame directly, the Bicturemaker belongs to the scene which is loading.
+    """
+    def __init__(self) -> None:
+        self.font = None
+        self.elapsed = 0.0
+        self.label = ""
+
+    def load(self, context: SceneLoadContext):
+        self.font = pygame.font.SysFont(None, 32)
+
+    def begin(self, label: str):
+        self.elapsed = 0.0
+        self.label = label
+
+    def tick(self, context: TickContext) -> bool:
+        self.elapsed += context.delta_ms / 1000
+        (w, h) = context.screen.get_size()
+        center = (w // 2, h // 2)
+        dots = 12
+        for i in range(dots):
+            angle = 2 * math.pi * i / dots
+            # The brightest dot runs around once per second.
+            brightness = int(255 * (((i / dots) - self.elapsed) % 1.0))
+            pos = (int(center[0] + math.cos(angle) * 40), int(center[1] + math.sin(angle) * 40))
+            pygame.draw.circle(context.screen, (brightness, brightness, brightness), pos, 6)
+        if self.font is not None and self.label:
+            textimg = self.font.render(self.label, True, (255, 255, 255))
+            context.screen.blit(textimg, (center[0] - textimg.get_width() // 2, center[1] + 70))
+        return False
+
+    def unload(self):
+        pass
+
+class SceneLoader:
+    """
+    Switches from old_scene to new_scene while the engine keeps rendering the TransitionScene:
+
+    1. old_scene.unload() on a worker thread (stopping the barser can take a while).
+    2. Preparing the new scene on a worker thread: `new_scene.prepare(context)` is called, if the scene has it, then
+       its `assets` are read and decoded. Only pure Python and file I/O belong there - no display, fonts, Bicturemaker
+       or processes, none of that is thread-safe.
+    3. new_scene.load(context) on the main thread, between two frames. Converting surfaces, fonts, the Bicturemaker
+       and forking the barser are fine there.
+
+    Scenes whose unload has to run on the main thread as well (e.g. opening joysticks) set `unload_on_main_thread`.
+    Once all steps are done the loader waits until `new_scene.ready()` (if the scene has it) returns True.
+
+    poll() is called once per frame by the engine, exceptions of the worker are re-raised there.
+    """
+    def __init__(self, old_scene, new_scene, context: LoadContext) -> None:
+        self.new_scene = new_scene
+        self.context = context
+        self.steps = [
+            (old_scene.unload, getattr(old_scene, "unload_on_main_thread", False)),
+            (self.__prepare, False),
+            (lambda: new_scene.load(context), True),
+        ]
+        self.thread: Optional[threading.Thread] = None
+        self.error: Optional[BaseException] = None
+        self.started = perf_counter()
+
+    def __prepare(self):
+        prepare = getattr(self.new_scene, "prepare", None)
+        if prepare is not None:
+            prepare(self.context)
+        # After prepare, which may only then know the assets (e.g. SceneWithBarser importing the game).
+        self.context.bassets.decode(getattr(self.new_scene, "assets", []))
+
+    def poll(self) -> bool:
+        """
+        Returns True once the new scene is loaded and ready.
+        """
+        if self.thread is not None:
+            if self.thread.is_alive():
+                return False
+            self.thread = None
+            if self.error is not None:
+                raise self.error
+        while self.steps:
+            (step, on_main_thread) = self.steps.pop(0)
+            if on_main_thread:
+                step()
+            else:
+                self.thread = threading.Thread(target=self.__run, args=(step,), name="scene-loader", daemon=True)
+                self.thread.start()
+                return False
+        return getattr(self.new_scene, "ready", lambda: True)()
+
+    def abort(self) -> bool:
+        """
+        Used when quitting in the middle of a transition. Waits for the running step and skips loading the new scene
+        if it did not start yet (the old scene is still unloaded). Returns whether the new scene got loaded.
+        """
+        if self.thread is not None:
+            self.thread.join()
+        if len(self.steps) == 3:
+            (unload, _) = self.steps.pop(0)
+            unload()
+        return not self.steps
+
+    def __run(self, step):
+        try:
+            step()
+        except BaseException as e:
+            self.error = e
+
 class InitTagsScene:
+    """
+    Shows the image of the (first) camera until it found its tags.
+    """
     def __init__(self, bame: "Bame"):
         self.tag_size = bame.barameters.tag_size
-        self.tags = [ pygame.transform.scale(pygame.image.load("img/" + str(num) + ".png"), (self.tag_size, self.tag_size)) for num in range(4) ]
+        self.assets = tag_paths(bame.barameters)
         self.found = False
         self.bame = bame
 
     def load(self, context: SceneLoadContext):
-        self.taker = Bicturetaker(cam_index=self.bame.barameters.camera_index, tag_timeout=0.1)
+        self.tags = load_tags(context.bassets, self.bame.barameters)
+        from lib.bicturetaker import Bicturetaker
+        from lib.barser import BarserCamera
+        settings = self.bame.barameters
+        camera = BarserCamera.all_from_barameters(settings)[0]
+        self.taker = Bicturetaker((camera.region[2], camera.region[3]), capture=camera.capture, tag_ids=camera.tag_ids, tag_timeout=0.1, nthreads=settings.detector_threads, quad_decimate=settings.quad_decimate)
 
     def tick(self, context: TickContext) -> bool:
+        import cv2
+        import numpy as np
         d = self.taker.take_bicture()
         if "img" in d:
             if self.found:
@@ -92,21 +282,19 @@ class InitTagsScene:
         img = np.swapaxes(img, 0, 1)
         s = pygame.pixelcopy.make_surface(img)
         context.screen.blit(s, (0, 0))
-        shape = context.screen.get_size()
-        context.screen.blits([
-            (self.tags[0], (0, shape[1]-self.tag_size)),
-            (self.tags[1], (shape[0]-self.tag_size, shape[1]-self.tag_size)),
-            (self.tags[2], (shape[0]-self.tag_size, 0)),
-            (self.tags[3], (0, 0))
-        ])
+        context.screen.blits(tag_blits(self.tags, self.bame.barameters))
         return False
 
     def unload(self):
+        self.taker.close()
         del self.taker
 
 class BamePadScene:
     factory: BamePadFactory
     registrar: BeymapRegistrar
+    supports_dirty_rects = True
+    # Builds the BamePadManager, SDL wants joysticks to be opened on the main thread.
+    unload_on_main_thread = True
     def __init__(self, bame: "Bame") -> None:
         self.bame = bame
         pass
@@ -117,15 +305,19 @@ class BamePadScene:
         self.font = pygame.font.SysFont(None, 24)
         pass
 
-    def tick(self, context: TickContext):
+    def draw_background(self, surface):
         textimg = self.font.render(f'Press bottom symbol button (A) to join. Press it again to be ready', True, (255, 255, 255))
-        context.screen.blit(textimg, (0, 0))
+        surface.blit(textimg, (0, 0))
         textimg = self.font.render(f'Press right symbol button (B) to leave.', True, (255, 255, 255))
-        context.screen.blit(textimg, (0, 20))
+        surface.blit(textimg, (0, 20))
         textimg = self.font.render(f'Press right symbol button (B) to leave.', True, (255, 255, 255))
-        context.screen.blit(textimg, (0, 40))
+        surface.blit(textimg, (0, 40))
         textimg = self.font.render(f'Game starts when everyone is ready.', True, (255, 255, 255))
-        context.screen.blit(textimg, (0, 60))
+        surface.blit(textimg, (0, 60))
+
+    def tick(self, context: TickContext):
+        if context.dirty is None:
+            self.draw_background(context.screen)
 
         player_list_start = 5
 
@@ -134,7 +326,9 @@ class BamePadScene:
         player_height = 20
         for idx, parcel in enumerate(self.factory.get_active_controllers()):
             textimg = self.font.render(f'Player {parcel.metadata.player_num}: {parcel.metadata.get_name()} - Ready: {parcel.ready}', True, (0, 255, 0) if parcel.ready else (255, 255, 255))
-            context.screen.blit(textimg, (0, player_list_start*20 + idx*player_height))
+            rect = context.screen.blit(textimg, (0, player_list_start*20 + idx*player_height))
+            if context.dirty is not None:
+                context.dirty.mark(rect)
             if not parcel.ready:
                 can_start = False
 
@@ -150,22 +344,64 @@ class BamePadScene:
         pass
 
 class SceneWithBarser:
-    def __init__(self, bame: "Bame", game_instance: Any):
+    def __init__(self, bame: "Bame", game: Union[BameMetadata, Any]):
+        """
+        game: The game instance, or the BameMetadata of the game. Then the game module is imported and the game is
+              created in prepare(), on the worker of the SceneLoader, so selecting a game does not stall the frame.
+        """
         self.bame = bame
-        self.game_instance = game_instance
-        self.tags = [ pygame.transform.scale(pygame.image.load("img/" + str(num) + ".png"), (self.bame.barameters.tag_size, self.bame.barameters.tag_size)) for num in range(4) ]
+        self.metadata = game if isinstance(game, BameMetadata) else None
+        self.game_instance = None if self.metadata is not None else game
+        self.title = self.metadata.name if self.metadata is not None else type(game).__name__
+        self.assets = tag_paths(bame.barameters)
+        self.supports_dirty_rects = False
+        if self.game_instance is not None:
+            self.__take_attributes()
         # TODO: Barser is initiated here and therefore always scans...1920.
 
+    def __create_game(self):
+        self.game_instance = self.metadata.clazz()
+        self.__take_attributes()
+
+    def __take_attributes(self):
+        self.assets = tag_paths(self.bame.barameters) + getattr(self.game_instance, "assets", [])
+        # Games which only draw using the Bicturemaker get their drawings tracked and can opt into the dirty-rect mode.
+        self.supports_dirty_rects = getattr(self.game_instance, "supports_dirty_rects", False)
+
+    def prepare(self, scene_context: SceneLoadContext):
+        """
+        Worker thread, see SceneLoader, which decodes the assets (tags included) afterwards. Games can do their slow
+        pure-Python setup in prepare(context).
+        """
+        if self.game_instance is None:
+            self.__create_game()
+        prepare = getattr(self.game_instance, "prepare", None)
+        if prepare is not None:
+            prepare(scene_context)
+
     def load(self, scene_context: SceneLoadContext):
         context = LoadContext()
         context.bicturemaker = scene_context.bicturemaker
         context.beymap_registrar = scene_context.beymap_registrar
+        context.bhysics = scene_context.bhysics
+        context.bassets = scene_context.bassets
+        self.tags = load_tags(context.bassets, self.bame.barameters)
+        if self.game_instance is None:
+            # Loaded without the SceneLoader, e.g. as the first scene.
+            self.__create_game()
         self.game_instance.load(context)
         # TODO HANDLE THIS PROPERLY:
         if not self.bame.barameters.start_without_barser:
+            from .barser import Barser, BarserOptions
             self.barser = Barser(self.game_instance,options=BarserOptions.from_barameters(self.bame.barameters))
             self.barser.launch()
 
+    def ready(self) -> bool:
+        """
+        The transition scene is shown until the barser sent its first payload.
+        """
+        return self.bame.barameters.start_without_barser or self.barser.get_bayload() is not None
+
     def tick(self, context: TickContext) -> bool:
         next_scene = False
         if self.bame.barameters.start_without_barser:
@@ -177,25 +413,28 @@ class SceneWithBarser:
                 barsed_context.age = time() - parsed_game.time
                 barsed_context.data = parsed_game.data.barsed_info
                 barsed_context.image = parsed_game.data.image
+                barsed_context.version = parsed_game.version
                 next_scene = self.game_instance.tick(context, barsed_context)
             else:
+                # Only happens if the scene was not loaded by the SceneLoader, which waits for the first payload.
                 print("Waiting for barser to do something....")
-                # TODO: Draw some sort of loading sign on the game... parsed_game is None until the barser emtis for the first time.
-                pass
-
-        shape = context.screen.get_size()
-        context.screen.blits([
-            (self.tags[0], (0, shape[1]-context.barameters.tag_size)),
-            (self.tags[1], (shape[0]-context.barameters.tag_size, shape[1]-context.barameters.tag_size)),
-            (self.tags[2], (shape[0]-context.barameters.tag_size, 0)),
-            (self.tags[3], (0, 0))
-        ])
+
+        if context.dirty is None:
+            self.draw_background(context.screen)
         return next_scene
 
+    def draw_background(self, surface):
+        surface.blits(tag_blits(self.tags, self.bame.barameters))
+
     def unload(self):
-        self.barser.stop()
+        # There is no barser if the scene was started with --ignore-barser.
+        if getattr(self, "barser", None) is not None:
+            report = self.barser.stop()
+            write_bench(self.bame.barameters.benchmark_output, "barser_shutdown", report)
+            self.barser = None
 
 class BameSelectorScene:
+    supports_dirty_rects = True
     def __init__(self, bame: "Bame", metadatas: List[BameMetadata]) -> None:
         self.metadatas = metadatas
         self.selected = -1
@@ -218,7 +457,9 @@ class BameSelectorScene:
             if self.selected == idx:
                 color = (0, 255, 0)
             textimg = self.font.render(f"{metadata.name} (Player Requirements: {metadata.players})", True, color)
-            context.screen.blit(textimg, (0, idx*20))
+            rect = context.screen.blit(textimg, (0, idx*20))
+            if context.dirty is not None:
+                context.dirty.mark(rect)
         
         for event in context.bvents:
             if event.action == "DOWN" and event.value == True:
@@ -236,8 +477,8 @@ class BameSelectorScene:
                     if players:
                         if players != metadata.players:
                             continue
-                game_instance = metadata.clazz()
-                self.bame.scenes.append(SceneWithBarser(self.bame, game_instance))
+                # The game module is imported by the SceneLoader, not here in the middle of a frame.
+                self.bame.scenes.append(SceneWithBarser(self.bame, metadata))
                 return True
         return False
 
@@ -249,12 +490,20 @@ class Bame:
     beymap: Optional[BeymapManager]
     def __init__(self, classname: Union[Type, List[BameMetadata]]):
         self.barameters = Barameters()
+        PROFILER.mark("barameters")
         self.bamepads = None
+        self.beymap_registrar = None
+        load_maps(self.barameters.controller_maps)
         # Get Barsers from game_instance using the decorators
         # Pass Barsers to SceneWithBarser
         self.running = False
         self.beymap = None
-
+        self.bhysics = Bhysics(self.barameters.physics_rate, self.barameters.physics_max_steps)
+        self.bassets = Bassets(self.barameters.asset_budget_mb)
+        self.transition_scene = TransitionScene()
+        self.scene_loader: Optional[SceneLoader] = None
+        self.batency = BatencyMeter() if self.barameters.measure_latency else None
+        self.bvent_injector = BventInjector(self.barameters.inject_script) if self.barameters.inject_script else None
 
         self.scenes = (
                     [SplashScene(self)] if not self.barameters.quick_start else []
@@ -273,39 +522,75 @@ class Bame:
             ctypes.windll.user32.SetProcessDPIAware()
 
         pygame.init()
-        self.screen = pygame.display.set_mode((1920, 1080), pygame.FULLSCREEN if self.barameters.fullscreen else pygame.RESIZABLE)
+        PROFILER.mark("pygame.init")
+        self.bacer = Bacer(self.barameters.frame_pacing, self.barameters.target_fps)
+        flags = pygame.FULLSCREEN if self.barameters.fullscreen else pygame.RESIZABLE
+        if self.bacer.mode == Bacer.VSYNC:
+            try:
+                # vsync is only supported by the SCALED or OPENGL renderers.
+                self.screen = pygame.display.set_mode((1920, 1080), flags | pygame.SCALED, vsync=1)
+                # pygame 2.2+, 0 if SDL does not know either.
+                get_refresh_rate = getattr(pygame.display, "get_current_refresh_rate", None)
+                self.bacer.set_refresh_rate(get_refresh_rate() if get_refresh_rate is not None else None)
+            except pygame.error as e:
+                print(f"Could not enable vsync ({e}), falling back to fps pacing.")
+                self.bacer = Bacer(Bacer.FPS, self.barameters.target_fps)
+                self.screen = pygame.display.set_mode((1920, 1080), flags)
+        else:
+            self.screen = pygame.display.set_mode((1920, 1080), flags)
         self.bicturemaker = Bicturemaker(self.screen, self.barameters)
+        self.birtyrects = BirtyRects(self.screen)
+        PROFILER.mark("display")
+        PROFILER.preload(HEAVY_MODULES)
 
         self.start_loop()
 
     def next_scene(self):
-        self.scenes[0].unload()
-        self.scenes.pop(0)
+        """
+        Starts the transition to the next scene. The old scene is unloaded and the new one loaded by a SceneLoader
+        while the TransitionScene is shown, see scene_loaded.
+        """
+        old_scene = self.scenes.pop(0)
         if len(self.scenes) == 0:
+            old_scene.unload()
             self.running = False
         else:
             print(f"Loading scene: {self.scenes[0]}")
+            self.bhysics.clear()
+            self.birtyrects.reset()
             beymap_registrar = BeymapRegistrar()
+            self.beymap_registrar = beymap_registrar
             context = LoadContext()
             context.bicturemaker = self.bicturemaker
             context.beymap_registrar = beymap_registrar
-            self.scenes[0].load(context)
-            if self.bamepads is not None:
-                self.beymap = beymap_registrar.build(self.bamepads, self.barameters)
-            print(f"Scene loaded.")
+            context.bhysics = self.bhysics
+            context.bassets = self.bassets
+            self.__prefetch_next_scene()
+            self.transition_scene.begin(f"Loading {getattr(self.scenes[0], 'title', '')}...")
+            self.scene_loader = SceneLoader(old_scene, self.scenes[0], context)
+
+    def scene_loaded(self):
+        print(f"Scene loaded in {(perf_counter() - self.scene_loader.started) * 1000:.0f}ms.")
+        self.scene_loader = None
+        self.birtyrects.reset()
+        # The beymap is built on the main thread, the bamepads might have been replaced by the old scene.
+        if self.bamepads is not None:
+            self.beymap = self.beymap_registrar.build(self.bamepads, self.barameters)
 
     def start_loop(self):
-        clock = pygame.time.Clock()
-
         self.running = True
 
         context = LoadContext()
         context.bicturemaker = self.bicturemaker
+        context.bhysics = self.bhysics
+        context.bassets = self.bassets
+        self.transition_scene.load(context)
+        self.__prefetch_next_scene()
         self.scenes[0].load(context)
         while self.running:
-            delta_t = clock.tick(60)
+            delta_t = self.bacer.tick()
             context = TickContext()
-            context.fps = 1000/delta_t
+            context.fps = 1000/max(delta_t, 0.001)
             context.delta_ms = delta_t
             context.screen = self.screen
             context.barameters = self.barameters
@@ -313,24 +598,85 @@ class Bame:
             context.bamepads = self.bamepads
             context.bicturemaker = self.bicturemaker
             context.beymap = self.beymap
-
-            self.screen.fill((0, 0, 0)) 
+            context.bhysics = self.bhysics
+            context.bassets = self.bassets
+            # While a scene is loading, its spaces are not stepped and the transition scene is shown instead.
+            loading = self.scene_loader is not None
+            scene = self.transition_scene if loading else self.scenes[0]
+            context.dirty = self.__dirty_rects_for(scene)
+            self.bicturemaker.dirty = context.dirty
+
+            if not loading:
+                self.bhysics.advance(delta_t / 1000)
+
+            if context.dirty is not None:
+                context.dirty.restore()
+            else:
+                self.screen.fill((0, 0, 0)) 
             
-            next_scene = self.scenes[0].tick(context)
-            if next_scene:
-                self.next_scene()
+            next_scene = scene.tick(context)
+
+            if context.dirty is not None:
+                rects = context.dirty.flush()
+                if rects is None:
+                    pygame.display.flip()
+                else:
+                    pygame.display.update(rects)
+            else:
+                pygame.display.flip()
+            PROFILER.first_frame()
+
+            if self.batency is not None:
+                self.batency.frame_flipped(context.bvents, self.bamepads)
 
-            pygame.display.flip()
+            if loading:
+                if self.scene_loader.poll():
+                    self.scene_loaded()
+            elif next_scene:
+                self.next_scene()
 
-        if len(self.scenes) > 0:
+        if self.scene_loader is not None:
+            if self.scene_loader.abort():
+                self.scenes[0].unload()
+        elif len(self.scenes) > 0:
             self.scenes[0].unload()
 
+        print(self.bacer.report())
+        if self.batency is not None:
+            print(self.batency.report())
+        print(self.bassets.report())
+        print(self.bhysics.decompositions.report())
+        print(PROFILER.report())
+        write_bench(self.barameters.benchmark_output, "startup", PROFILER.as_dict())
+
+    def __prefetch_next_scene(self):
+        if len(self.scenes) > 1:
+            self.bassets.prefetch(getattr(self.scenes[1], "assets", []))
+
+    def __dirty_rects_for(self, scene) -> Optional[BirtyRects]:
+        if not self.barameters.dirty_rects or not getattr(scene, "supports_dirty_rects", False):
+            return None
+        if self.birtyrects.background_stale:
+            if hasattr(scene, "draw_background"):
+                scene.draw_background(self.birtyrects.background)
+            self.birtyrects.background_stale = False
+            self.birtyrects.invalidate()
+        return self.birtyrects
+
     def handle_events(self) -> Tuple[List[Event], List[Bvent]]:
         unhandled_events = []
         bvents = []
 
         mouse_motion = None
+        # (instance_id, axis) -> latest event. Sticks produce loads of these, only the last one per frame matters.
+        axis_motions: Dict[Tuple[int, int], Event] = {}
+
+        if self.beymap is not None:
+            self.beymap.begin_frame()
 
+        if self.bvent_injector is not None:
+            self.bvent_injector.pump()
+        now = perf_counter()
 
         # Pump events from pygame
         for event in pygame.event.get():
@@ -339,25 +685,43 @@ class Bame:
                 # Accumulate mouse-motion events into one single big mouse-motion
                 if event.type == pygame.MOUSEMOTION:
                     mouse_motion = event # TODO: Mouse-Motion own deltax and deltay .... update them accordingly.
+                elif event.type == pygame.JOYAXISMOTION:
+                    axis_motions[(event.instance_id, event.axis)] = event
                 else:
-                    # Map Gamepad events
-                    unhandled_events.append(event)
-                    if self.bamepads is not None:
-                        event = self.bamepads.map_event(event)
-                    if self.beymap is not None and isinstance(self.beymap, BeymapManager):
-                        event = self.beymap.map_event(event)
-                    if isinstance(event, Bvent):
-                        bvents.append(event)
+                    self.__map_event(event, unhandled_events, bvents, now)
+
+        for event in axis_motions.values():
+            self.__map_event(event, unhandled_events, bvents, now)
 
         if mouse_motion is not None:
             unhandled_events.append(mouse_motion)
         return (unhandled_events, bvents)
+
+    def __map_event(self, event: Event, unhandled_events: List[Event], bvents: List[Bvent], now: float):
+        # Map Gamepad events
+        unhandled_events.append(event)
+        bvent = None
+        if self.beymap is not None:
+            bvent = self.beymap.dispatch_event(event)
+        elif self.bamepads is not None:
+            bvent = self.bamepads.map_event(event)
+        if bvent is not None:
+            if self.batency is not None:
+                self.batency.stamp(bvent, event, now)
+            bvents.append(bvent)
             
     def handle_event(self, event):
         if event.type == pygame.QUIT:
             self.running = False
             return True
+        if event.type in (pygame.JOYDEVICEADDED, pygame.JOYDEVICEREMOVED):
+            if self.bamepads is not None and self.bamepads.handle_device_event(event):
+                if self.beymap_registrar is not None:
+                    self.beymap = self.beymap_registrar.build(self.bamepads, self.barameters)
+            # Scenes (BamePadScene) might want to know too.
+            return False
         if event.type == pygame.WINDOWRESIZED:
+            self.birtyrects.reset()
             pygame.display.update()
             return True
 
@@ -3,11 +3,14 @@ from pygame.constants import K_KP0, K_RETURN
 from lib.barameters import Barameters
 from lib import beymap
 import pygame.key
-from typing import Any, Dict, List, Optional, Set, Tuple, Union
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
 import pygame
 from pygame.event import Event
 from pygame.joystick import Joystick
 import pygame.joystick as js
+import os
+import platform
+import toml
 
 BUTTON_SYMBOL_BOTTOM = "BLETTER_BOTTOM"
 BUTTON_SYMBOL_TOP = "BLETTER_TOP"
@@ -49,101 +52,9 @@ LEFT_HAT="LEFT_HAT"
 WEIRD_DISABLED_SHIT="WEIRD!!!"
 
 
+# guid -> type -> raw -> control.
+# Real controllers are loaded from the files in controllers/ by load_maps(), only the keyboard emulation lives here.
 MAPS = {
-        # "Wired Wireless Steam Controller": {
-        # "03000000de2800000211000011010000": {
-        # "Dongled Wireless Steam Controller": {
-        "03000000de2800004211000011010000": {
-            "BUTTONS": {
-                
-            0: TOUCH_LEFT,
-            1: TOUCH_RIGHT,
-            2: BUTTON_SYMBOL_BOTTOM,
-            3: BUTTON_SYMBOL_RIGHT,
-            4: BUTTON_SYMBOL_LEFT,
-            5: BUTTON_SYMBOL_TOP,
-            6: SHOULDER_LEFT,
-            7: SHOULDER_RIGHT,
-            8: TRIGGER_LEFT,
-            9: TRIGGER_RIGHT,
-            10: MENU_LEFT,
-            11: MENU_RIGHT,
-            12: VENDOR_BUTTON,
-            13: LEFT_AXES_PRESS,
-            14: RIGHT_AXES_PRESS,
-            15: BEHIND_LEFT,
-            16: BEHIND_RIGHT
-                },
-            "AXES": {
-
-                0: AXIS_LEFT_HORIZONTAL,
-                1: AXIS_LEFT_VERTICAL,
-                2: AXIS_RIGHT_HORIZONTAL,
-                3: AXIS_RIGHT_VERTICAL,
-                },
-            "HATS": {
-                0: LEFT_HAT
-                }
-        },
-        # "Xbox One S Controller": {
-        "050000005e040000e002000003090000": {
-            "BUTTONS": {
-
-            0: BUTTON_SYMBOL_BOTTOM,
-            1: BUTTON_SYMBOL_RIGHT,
-            2: BUTTON_SYMBOL_LEFT,
-            3: BUTTON_SYMBOL_TOP,
-            4: SHOULDER_LEFT,
-            5: SHOULDER_RIGHT,
-            6: MENU_LEFT,
-            7: MENU_RIGHT,
-            8: LEFT_AXES_PRESS,
-            9: RIGHT_AXES_PRESS,
-            10: VENDOR_BUTTON
-                },
-
-            "AXES": {
-
-                0: AXIS_LEFT_HORIZONTAL,
-                1: AXIS_LEFT_VERTICAL,
-                2: AXIS_LEFT_TRIGGER,
-                3: AXIS_RIGHT_HORIZONTAL,
-                4: AXIS_RIGHT_VERTICAL,
-                5: AXIS_RIGHT_TRIGGER,
-                },
-
-            "HATS": {
-                0: LEFT_HAT
-                }
-        },
-        # "DragonRise Inc. Generic USB Joystick": {
-        "03000000790000000600000010010000": {
-            "BUTTONS": {
-            0: BUTTON_SYMBOL_TOP,
-            1: BUTTON_SYMBOL_RIGHT,
-            2: BUTTON_SYMBOL_BOTTOM,
-            3: BUTTON_SYMBOL_LEFT,
-            4: TRIGGER_LEFT,
-            5: TRIGGER_RIGHT,
-            6: SHOULDER_LEFT,
-            7: SHOULDER_RIGHT,
-            8: MENU_LEFT,
-            9: MENU_RIGHT,
-            10: LEFT_AXES_PRESS,
-            11: RIGHT_AXES_PRESS
-            },
-            "AXES": {
-                0: AXIS_LEFT_HORIZONTAL,
-                1: AXIS_LEFT_VERTICAL,
-                2: WEIRD_DISABLED_SHIT,
-                3: AXIS_RIGHT_HORIZONTAL,
-                4: AXIS_RIGHT_VERTICAL
-                },
-
-            "HATS": {
-                0: LEFT_HAT
-                }
-        },
         "KEYBOARDEMU1": {
             "BUTTONS": {
                 pygame.K_UP: BUTTON_SYMBOL_TOP,       
@@ -162,6 +73,157 @@ MAPS = {
             }
     }
 
+# Name in the controller files -> control.
+CONTROLS = {
+        "BUTTON_SYMBOL_BOTTOM": BUTTON_SYMBOL_BOTTOM,
+        "BUTTON_SYMBOL_TOP": BUTTON_SYMBOL_TOP,
+        "BUTTON_SYMBOL_LEFT": BUTTON_SYMBOL_LEFT,
+        "BUTTON_SYMBOL_RIGHT": BUTTON_SYMBOL_RIGHT,
+        "BUTTON_A": BUTTON_A,
+        "BUTTON_B": BUTTON_B,
+        "BUTTON_X": BUTTON_X,
+        "BUTTON_Y": BUTTON_Y,
+        "TRIGGER_LEFT": TRIGGER_LEFT,
+        "TRIGGER_RIGHT": TRIGGER_RIGHT,
+        "SHOULDER_RIGHT": SHOULDER_RIGHT,
+        "SHOULDER_LEFT": SHOULDER_LEFT,
+        "MENU_RIGHT": MENU_RIGHT,
+        "MENU_LEFT": MENU_LEFT,
+        "VENDOR_BUTTON": VENDOR_BUTTON,
+        "LEFT_AXES_PRESS": LEFT_AXES_PRESS,
+        "RIGHT_AXES_PRESS": RIGHT_AXES_PRESS,
+        "BEHIND_RIGHT": BEHIND_RIGHT,
+        "BEHIND_LEFT": BEHIND_LEFT,
+        "TOUCH_LEFT": TOUCH_LEFT,
+        "TOUCH_RIGHT": TOUCH_RIGHT,
+        "AXIS_RIGHT_VERTICAL": AXIS_RIGHT_VERTICAL,
+        "AXIS_LEFT_VERTICAL": AXIS_LEFT_VERTICAL,
+        "AXIS_RIGHT_HORIZONTAL": AXIS_RIGHT_HORIZONTAL,
+        "AXIS_LEFT_HORIZONTAL": AXIS_LEFT_HORIZONTAL,
+        "AXIS_LEFT_TRIGGER": AXIS_LEFT_TRIGGER,
+        "AXIS_RIGHT_TRIGGER": AXIS_RIGHT_TRIGGER,
+        "LEFT_HAT": LEFT_HAT,
+        "WEIRD_DISABLED_SHIT": WEIRD_DISABLED_SHIT,
+        }
+
+# SDL_GameControllerDB button name -> (control if bound to a button, control if bound to an axis)
+SDL_CONTROLS = {
+        "a": (BUTTON_SYMBOL_BOTTOM, None),
+        "b": (BUTTON_SYMBOL_RIGHT, None),
+        "x": (BUTTON_SYMBOL_LEFT, None),
+        "y": (BUTTON_SYMBOL_TOP, None),
+        "back": (MENU_LEFT, None),
+        "start": (MENU_RIGHT, None),
+        "guide": (VENDOR_BUTTON, None),
+        "leftshoulder": (SHOULDER_LEFT, None),
+        "rightshoulder": (SHOULDER_RIGHT, None),
+        "leftstick": (LEFT_AXES_PRESS, None),
+        "rightstick": (RIGHT_AXES_PRESS, None),
+        "lefttrigger": (TRIGGER_LEFT, AXIS_LEFT_TRIGGER),
+        "righttrigger": (TRIGGER_RIGHT, AXIS_RIGHT_TRIGGER),
+        "leftx": (None, AXIS_LEFT_HORIZONTAL),
+        "lefty": (None, AXIS_LEFT_VERTICAL),
+        "rightx": (None, AXIS_RIGHT_HORIZONTAL),
+        "righty": (None, AXIS_RIGHT_VERTICAL),
+        }
+
+SDL_PLATFORMS = {
+        "Linux": "Linux",
+        "Windows": "Windows",
+        "Darwin": "Mac OS X",
+        }
+
+def parse_toml_map(path: str) -> Tuple[str, Dict[str, Dict[int, str]]]:
+    data = toml.load(path)
+    mapping: Dict[str, Dict[int, str]] = { "BUTTONS": {}, "AXES": {}, "HATS": {} }
+    for type in mapping.keys():
+        for (raw, control) in data.get(type, {}).items():
+            if control not in CONTROLS:
+                raise Exception(f"Unknown control '{control}' in {path}")
+            mapping[type][int(raw)] = CONTROLS[control]
+    return (data["guid"], mapping)
+
+def parse_sdl_maps(path: str) -> Dict[str, Dict[str, Dict[int, str]]]:
+    platform_name = SDL_PLATFORMS.get(platform.system())
+    maps = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            fields = line.split(",")
+            if len(fields) < 2:
+                print(f"Skipping malformed line in {path}: {line}")
+                continue
+            (guid, _, *bindings) = fields
+            mapping: Dict[str, Dict[int, str]] = { "BUTTONS": {}, "AXES": {}, "HATS": {} }
+            entry_platform = None
+            for binding in bindings:
+                if ":" not in binding:
+                    continue
+                (name, source) = binding.split(":", 1)
+                if name == "platform":
+                    entry_platform = source
+                    continue
+                source = source.strip("+-~")
+                if name.startswith("dp") and source.startswith("h"):
+                    mapping["HATS"][int(source[1:].split(".")[0])] = LEFT_HAT
+                    continue
+                if name not in SDL_CONTROLS or len(source) < 2:
+                    continue
+                (button_control, axis_control) = SDL_CONTROLS[name]
+                if source[0] == "b" and button_control is not None:
+                    mapping["BUTTONS"][int(source[1:])] = button_control
+                if source[0] == "a" and axis_control is not None:
+                    mapping["AXES"][int(source[1:])] = axis_control
+            if entry_platform is None or entry_platform == platform_name:
+                maps[guid] = mapping
+    return maps
+
+def load_maps(directory: str):
+    """
+    Loads all controller mappings from the directory into MAPS (see controllers/Readme.md).
+    """
+    if not os.path.isdir(directory):
+        print(f"Controller map directory '{directory}' does not exist. Only the keyboard will work.")
+        return
+    files = sorted(os.listdir(directory))
+    for file in files:
+        if file.endswith(".txt"):
+            MAPS.update(parse_sdl_maps(os.path.join(directory, file)))
+    for file in files:
+        if file.endswith(".toml"):
+            (guid, mapping) = parse_toml_map(os.path.join(directory, file))
+            MAPS[guid] = mapping
+    REVERSE_MAPS.clear()
+    print(f"Loaded {len(MAPS)} controller mappings from '{directory}'.")
+
+# guid -> control -> (type, raw). Built lazily from MAPS, once per controller type.
+REVERSE_MAPS: Dict[str, Dict[str, Tuple[str, int]]] = {}
+
+def reverse_map_for(guid: str) -> Optional[Dict[str, Tuple[str, int]]]:
+    if guid not in REVERSE_MAPS:
+        if guid not in MAPS:
+            return None
+        reverse_map = {}
+        for type, map in MAPS[guid].items():
+            for raw, control in map.items():
+                # The first mapping wins, the same as the old linear search.
+                if control not in reverse_map:
+                    reverse_map[control] = (type, raw)
+        REVERSE_MAPS[guid] = reverse_map
+    return REVERSE_MAPS[guid]
+
+def unmapped_control(raw) -> None:
+    return None
+
+WARNINGS: Set[str] = set()
+
+def warn_once(message: str):
+    if message not in WARNINGS:
+        WARNINGS.add(message)
+        print(message)
+
 def get_fake_joystick_id(type: str, index: int) -> int:
     if type == "KEYBOARD" and index == 1:
         return -1
@@ -173,9 +235,7 @@ class KeyboardFakeJoystick:
         pass
 
     def get_button(self, raw):
-        result = pygame.key.get_pressed()[raw] == 1
-        print("GET BUTTON: ", raw, pygame.K_LEFT, result)
-        return result
+        return pygame.key.get_pressed()[raw] == 1
 
     def get_axis(self, raw):
         return None
@@ -199,6 +259,7 @@ class KeyboardFakeJoystick:
 class JoystickMetadata:
     def __init__(self, joystick: Joystick) -> None:
         self.__joystick = joystick
+        self.guid = joystick.get_guid()
         self.player_num = 0
         pass
 
@@ -222,55 +283,62 @@ class JoystickMetadata:
 
 
     def __map(self, type, raw) -> str:
-        name = self.__joystick.get_guid()
+        name = self.guid
         if name in MAPS:
             map = MAPS[name][type]
             if raw in map:
                 return map[raw]
             else:
                 # raise Exception(f"Gamepad '{name}' pressed button <{raw_button}> which is not yet present in the MAPS in bamepad.py")
-                print(f"Gamepad '{name}' moved {type} <{raw}> which is not yet present in the MAPS in bamepad.py")
+                warn_once(f"Gamepad '{name}' moved {type} <{raw}> which is not yet present in the MAPS in bamepad.py")
         else:
             # raise Exception(f"Unknown Gamepad '{name}' is not yet present in the MAPS in bamepad.py")
-            print(f"Unknown Gamepad '{name}' is not yet present in the MAPS in bamepad.py")
+            warn_once(f"Unknown Gamepad '{name}' is not yet present in the MAPS in bamepad.py")
         return WEIRD_DISABLED_SHIT
 
-    def __reverse_map(self, type, control) -> Optional[Tuple[str, int]]:
-        name = self.__joystick.get_guid()
-        if name in MAPS:
-            for type, map in MAPS[name].items():
-                for raw, name in map.items():
-                    if name == control:
-                        return (type, raw)
-        else:
+    def __reverse_map(self, control) -> Optional[Tuple[str, int]]:
+        reverse_map = reverse_map_for(self.guid)
+        if reverse_map is None:
             # raise Exception(f"Unknown Gamepad '{name}' is not yet present in the MAPS in bamepad.py")
-            print(f"Unknown Gamepad '{name}' is not yet present in the MAPS in bamepad.py")
-        return None
+            print(f"Unknown Gamepad '{self.guid}' is not yet present in the MAPS in bamepad.py")
+            return None
+        return reverse_map.get(control)
 
-    def __f_reverse_map(self, type, control) -> Tuple[str, int]:
-        r = self.__reverse_map(type, control)
+    def __f_reverse_map(self, control) -> Tuple[str, int]:
+        r = self.__reverse_map(control)
         if r is None:
             raise Exception(f"Could not reverse map {control} for controller {self.__joystick.get_name()}")
         return r
- 
-    def get_control(self, control) -> Union[Tuple[float, float], bool, float]:
-        (type, raw) = self.__f_reverse_map("HATS", control)
+
+    def compile_control(self, control) -> Tuple[Callable[[int], Any], int]:
+        """
+        Resolves a control once into the (getter, raw) pair which reads it from the device, so polling it is just `getter(raw)`.
+        """
+        (type, raw) = self.__f_reverse_map(control)
         if type == "HATS":
-            return self.__joystick.get_hat(raw)
+            return (self.__joystick.get_hat, raw)
         if type == "BUTTONS":
-            return self.__joystick.get_button(raw)
+            return (self.__joystick.get_button, raw)
         if type == "AXES":
-            return self.__joystick.get_axis(raw)
+            return (self.__joystick.get_axis, raw)
         raise Exception(f"Unknown type returned for control reverse mapping: {control} -> {type}, {raw} on controller {self.__joystick.get_name()}")
+ 
+    def get_control(self, control) -> Union[Tuple[float, float], bool, float]:
+        (getter, raw) = self.compile_control(control)
+        return getter(raw)
 
 class Bvent:
+    __slots__ = ["type", "control_name", "player", "value", "action", "timestamp"]
     action: Optional[str]
+    # perf_counter() of when the event entered the engine. Only set when measuring the input latency.
+    timestamp: Optional[float]
     def __init__(self, *, type: int, control_name: str, player: int, value: Any) -> None:
         self.control_name = control_name
         self.player = player
         self.value = value
         self.type = type
         self.action = None
+        self.timestamp = None
 
     def __str__(self) -> str:
         return f"<Bvent({self.type} : {self.control_name}({self.action}) player={self.player}, value={self.value})>"
@@ -283,37 +351,142 @@ JOYSTICK_EVENTS = {
         pygame.JOYAXISMOTION,
         }
 
+# Event type -> (attribute holding the raw index, type in MAPS)
+RAW_ATTRIBUTES = {
+        pygame.JOYBUTTONDOWN: ("button", "BUTTONS"),
+        pygame.JOYBUTTONUP: ("button", "BUTTONS"),
+        pygame.JOYAXISMOTION: ("axis", "AXES"),
+        pygame.JOYHATMOTION: ("hat", "HATS"),
+        pygame.KEYDOWN: ("key", "BUTTONS"),
+        pygame.KEYUP: ("key", "BUTTONS"),
+        }
+
+# Marker in the dispatch table for controls whose value is taken from the event (axes and hats).
+VALUE_FROM_EVENT = object()
+
+# Control type -> value of the control when nobody touches it
+REST_VALUES = {
+        "BUTTONS": False,
+        "AXES": 0.0,
+        "HATS": (0, 0),
+        }
+
+def rest_value(guid: str, control: str) -> Any:
+    """
+    Value of the control on a controller of model `guid` at rest, e.g. for a player whose controller is unplugged.
+    """
+    for (type, controls) in MAPS.get(guid, {}).items():
+        if control in controls.values():
+            return REST_VALUES.get(type)
+    return None
+
+# Event type -> fixed value for buttons
+EVENT_VALUES = {
+        pygame.JOYBUTTONDOWN: True,
+        pygame.JOYBUTTONUP: False,
+        pygame.KEYDOWN: True,
+        pygame.KEYUP: False,
+        }
+
+DispatchKey = Tuple[int, int, int]
+
+def dispatch_key(event: Event) -> Optional[DispatchKey]:
+    """
+    (instance_id, event type, raw index) of a controller event, None for all other events.
+    Keyboard events belong to the fake keyboard joystick.
+    """
+    raw_attribute = RAW_ATTRIBUTES.get(event.type)
+    if raw_attribute is None:
+        return None
+    if event.type in JOYSTICK_EVENTS:
+        instance_id = event.instance_id
+    else:
+        instance_id = get_fake_joystick_id("KEYBOARD", 1)
+    return (instance_id, event.type, getattr(event, raw_attribute[0]))
+
 class BamePadManager:
     joysticks: Dict[int, JoystickMetadata]
+    # (instance_id, event type, raw) -> (player, control_name, value)
+    dispatch: Dict[DispatchKey, Tuple[int, str, Any]]
+    # player -> guid of the controller which got unplugged
+    disconnected: Dict[int, str]
     def __init__(self, joysticks: List[JoystickMetadata]) -> None:
         self.joysticks = {}
         for stick in joysticks:
             self.joysticks[stick.instance_id()] = stick
 
-        pass
+        self.disconnected = {}
+        self.__warned: Set[DispatchKey] = set()
+        self.__recompile()
+
+    def __recompile(self):
+        self.dispatch = {}
+        for stick in self.joysticks.values():
+            self.__compile(stick)
+
+    def handle_device_event(self, event: Event) -> bool:
+        """
+        Handles controllers being plugged in and out during the game. Returns True if the joysticks changed.
+        A controller which gets plugged in takes over a player who lost their controller (preferring the same model).
+        """
+        if event.type == pygame.JOYDEVICEREMOVED:
+            stick = self.joysticks.pop(event.instance_id, None)
+            if stick is None:
+                return False
+            print(f"Player {stick.player_num} lost their controller.")
+            self.disconnected[stick.player_num] = stick.guid
+            self.__recompile()
+            return True
+        if event.type == pygame.JOYDEVICEADDED and self.disconnected:
+            joystick = Joystick(event.device_index)
+            if joystick.get_instance_id() in self.joysticks:
+                return False
+            stick = JoystickMetadata(joystick)
+            same_model = [player for (player, guid) in self.disconnected.items() if guid == stick.guid]
+            stick.player_num = same_model[0] if same_model else next(iter(self.disconnected))
+            del self.disconnected[stick.player_num]
+            self.joysticks[stick.instance_id()] = stick
+            print(f"Player {stick.player_num} is back with {stick.get_name()}.")
+            self.__recompile()
+            return True
+        return False
+
+    def __compile(self, stick: JoystickMetadata):
+        if stick.guid not in MAPS:
+            print(f"Unknown Gamepad '{stick.guid}' is not yet present in the MAPS in bamepad.py")
+            return
+        keyboard = stick.instance_id() == get_fake_joystick_id("KEYBOARD", 1)
+        for (event_type, (_, type)) in RAW_ATTRIBUTES.items():
+            if keyboard != (event_type in (pygame.KEYDOWN, pygame.KEYUP)):
+                continue
+            for (raw, control_name) in MAPS[stick.guid][type].items():
+                if control_name is WEIRD_DISABLED_SHIT:
+                    continue
+                value = EVENT_VALUES.get(event_type, VALUE_FROM_EVENT)
+                self.dispatch[(stick.instance_id(), event_type, raw)] = (stick.player_num, control_name, value)
 
     def map_event(self, event: Event) -> Optional[Union[Event, Bvent]]:
-        joystick = self.__get_joystick_from_event(event)
-        if joystick is not None:
-
-            (value, control_name) = self.__extract_mapped_control_from_event(joystick, event)
-            player = joystick.player_num
-            if control_name is WEIRD_DISABLED_SHIT: 
-                return None
-            return Bvent(
-                    control_name=control_name,
-                    value=value,
-                    player=player,
-                    type=event.type)
-
-    def __get_joystick_from_event(self, event: Event) -> Optional[JoystickMetadata]:
-        if event.type in JOYSTICK_EVENTS:
-            return self.joysticks[event.instance_id]
-        if event.type == pygame.KEYDOWN or event.type == pygame.KEYUP:
-            fake_id = get_fake_joystick_id("KEYBOARD", 1)
-            if fake_id in self.joysticks:
-                return self.joysticks[get_fake_joystick_id("KEYBOARD", 1)]
-        return None
+        key = dispatch_key(event)
+        if key is None:
+            return None
+        entry = self.dispatch.get(key)
+        if entry is None:
+            self.warn_unmapped(key)
+            return None
+        (player, control_name, value) = entry
+        return Bvent(
+                control_name=control_name,
+                value=event.value if value is VALUE_FROM_EVENT else value,
+                player=player,
+                type=event.type)
+
+    def warn_unmapped(self, key: DispatchKey):
+        """
+        Prints once per control of a known joystick which is not present in the MAPS.
+        """
+        if key[0] in self.joysticks and key not in self.__warned:
+            self.__warned.add(key)
+            print(f"Gamepad '{self.joysticks[key[0]].guid}' used event {pygame.event.event_name(key[1])} <{key[2]}> which is not yet present in the MAPS in bamepad.py")
 
     def of_player(self, player_num) -> Optional[JoystickMetadata]:
         for stick in self.joysticks.values():
@@ -324,21 +497,6 @@ class BamePadManager:
     def get_players(self) -> List[JoystickMetadata]:
         return list(self.joysticks.values())
 
-    def __extract_mapped_control_from_event(self, joystick: JoystickMetadata, event: Event) -> Tuple[Any, str]:
-        if event.type == pygame.JOYBUTTONUP:
-            return (False, joystick.map_button(event.button))
-        if event.type == pygame.JOYBUTTONDOWN:
-            return (True, joystick.map_button(event.button))
-        if event.type == pygame.JOYAXISMOTION:
-            return (event.value, joystick.map_axes(event.axis))
-        if event.type == pygame.JOYHATMOTION:
-            return (event.value, joystick.map_hat(event.hat))
-        if event.type == pygame.KEYDOWN:
-            return (True, joystick.map_button(event.key))
-        if event.type == pygame.KEYUP:
-            return (False, joystick.map_button(event.key))
-        raise Exception("Unsupported event type: ", event.type)
-
 class JoystickFactoryParcel:
     def __init__(self, joystick_metadata) -> None:
         self.metadata = joystick_metadata
@@ -385,7 +543,16 @@ class BamePadFactory:
                
 
     def handle_event(self, event: Event):
-        if event.type == pygame.JOYBUTTONDOWN:
+        if event.type == pygame.JOYDEVICEADDED:
+            # Also sent for every joystick which was already there on startup.
+            joystick = Joystick(event.device_index)
+            if joystick.get_instance_id() not in self.joysticks:
+                self.joysticks[joystick.get_instance_id()] = JoystickFactoryParcel(JoystickMetadata(joystick))
+        if event.type == pygame.JOYDEVICEREMOVED:
+            parcel = self.joysticks.pop(event.instance_id, None)
+            if parcel is not None and parcel.active:
+                self.player_nums.discard(parcel.metadata.player_num)
+        if event.type == pygame.JOYBUTTONDOWN and event.instance_id in self.joysticks:
             new_instance_id = event.instance_id
             self.handle_press(self.joysticks[new_instance_id], event.button)
         if event.type == pygame.KEYDOWN:
@@ -0,0 +1,271 @@
+import time
+from typing import Any, Dict, List, Optional, Tuple, Union
+import cv2
+import numpy as np
+from lib.barameters import Barameters
+
+# bgr: What OpenCV delivers by default (the camera's format converted by OpenCV).
+# yuyv / nv12: The raw frames of the camera. The luma plane goes to the detector as is and only the region which gets
+#              warped is converted to BGR.
+PIXEL_FORMATS = ["bgr", "yuyv", "nv12"]
+
+
+def luma(frame: np.ndarray, pixel_format: str) -> np.ndarray:
+    """
+    Grayscale image for the detector. Free for yuyv/nv12, a conversion for bgr.
+    """
+    if pixel_format == "yuyv":
+        # Y U Y V -> every first byte of a pixel pair. The detector needs contiguous memory.
+        return np.ascontiguousarray(frame[:, :, 0])
+    if pixel_format == "nv12":
+        # Y plane first, then the interleaved UV plane with half the height.
+        return frame[:frame.shape[0] * 2 // 3]
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+
+def to_bgr(frame: np.ndarray, pixel_format: str, region: Optional[Tuple[int, int, int, int]] = None) -> np.ndarray:
+    """
+    Converts the (x1, y1, x2, y2) region of the frame (everything if None) to BGR. Coordinates have to be even for yuyv/nv12.
+    """
+    if pixel_format == "bgr":
+        return frame if region is None else frame[region[1]:region[3], region[0]:region[2]]
+    if pixel_format == "yuyv":
+        if region is not None:
+            frame = frame[region[1]:region[3], region[0]:region[2]]
+        return cv2.cvtColor(frame, cv2.COLOR_YUV2BGR_YUYV)
+    height = frame.shape[0] * 2 // 3
+    if region is not None:
+        (x1, y1, x2, y2) = region
+        frame = np.vstack([frame[y1:y2, x1:x2], frame[height + y1 // 2:height + y2 // 2, x1:x2]])
+    return cv2.cvtColor(frame, cv2.COLOR_YUV2BGR_NV12)
+
+
+def fourcc_to_str(fourcc: float) -> str:
+    value = int(fourcc)
+    return "".join(chr((value >> (8 * i)) & 0xFF) for i in range(4))
+
+
+class BaptureConfig:
+    """
+    How to open the camera. Plain values only, this is pickled into the barser worker.
+
+    source: Camera index or the path of a video file, which is then played back (looping, at `fps`) as if it was a camera.
+    fourcc: Compressed format to ask the camera for (e.g. "MJPG", which most USB cameras need for 1080p at 30fps).
+            Ignored for pixel_format yuyv/nv12, which ask for the raw format instead. None keeps the driver default.
+    buffer_size: Frames the driver buffers. Every buffered frame is a frame of latency, 1 always reads the newest one.
+    exposure: Fixed exposure (driver units, e.g. 1/2^-n seconds for most V4L2/DirectShow cameras). None keeps auto exposure.
+    """
+    source: Union[int, str]
+    resolution: Tuple[int, int]
+    pixel_format: str
+    fourcc: Optional[str]
+    fps: Optional[float]
+    buffer_size: Optional[int]
+    exposure: Optional[float]
+
+    def __init__(self, source: Union[int, str] = 0, resolution: Tuple[int, int] = (1920, 1080), *, pixel_format: str = "bgr",
+                 fourcc: Optional[str] = None, fps: Optional[float] = None, buffer_size: Optional[int] = 1, exposure: Optional[float] = None) -> None:
+        if pixel_format not in PIXEL_FORMATS:
+            raise Exception(f"Unknown pixel format '{pixel_format}'. Use one of {PIXEL_FORMATS}.")
+        self.source = source
+        self.resolution = resolution
+        self.pixel_format = pixel_format
+        self.fourcc = fourcc
+        self.fps = fps
+        self.buffer_size = buffer_size
+        self.exposure = exposure
+
+    @staticmethod
+    def from_barameters(barameters: Barameters) -> "BaptureConfig":
+        return BaptureConfig(
+            barameters.camera_file if barameters.camera_file is not None else barameters.camera_index,
+            pixel_format=barameters.pixel_format,
+            fourcc=barameters.camera_fourcc,
+            fps=barameters.camera_fps,
+            buffer_size=barameters.camera_buffer_size,
+            exposure=barameters.camera_exposure,
+        )
+
+
+class Bapture:
+    """
+    A cv2.VideoCapture which got configured according to a BaptureConfig.
+
+    Drivers silently ignore settings they do not support, so everything is read back after setting it and the
+    differences are printed. `accepted` contains what the driver actually uses.
+    """
+
+    accepted: Dict[str, Any]
+
+    def __init__(self, config: BaptureConfig) -> None:
+        self.config = config
+        self.is_file = isinstance(config.source, str)
+        self.cap = cv2.VideoCapture(config.source)
+        if not self.cap.isOpened():
+            raise Exception(f"Could not open camera {config.source}.")
+        self.pixel_format = config.pixel_format
+        self.next_frame = None
+
+        if self.is_file:
+            # Files are decoded by OpenCV, there is nothing to negotiate.
+            self.pixel_format = "bgr"
+            self.frame_time = 1 / (config.fps or self.cap.get(cv2.CAP_PROP_FPS) or 30)
+        else:
+            self.__configure()
+        self.accepted = self.__read_back()
+        self.__verify()
+
+    def __configure(self):
+        config = self.config
+        # What the driver picked on its own, restored if the raw format does not work out.
+        original_fourcc = self.cap.get(cv2.CAP_PROP_FOURCC)
+        if config.pixel_format != "bgr":
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*config.pixel_format.upper()))
+            self.cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+        elif config.fourcc is not None:
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*config.fourcc))
+        self.__set_mode()
+        if config.buffer_size is not None:
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, config.buffer_size)
+        if config.exposure is not None:
+            if self.cap.getBackendName() == "V4L2":
+                # "Manual" for V4L2 through OpenCV. Other backends switch to manual when the exposure is set.
+                self.cap.set(cv2.CAP_PROP_AUTO_EXPOSURE, 0.25)
+            self.cap.set(cv2.CAP_PROP_EXPOSURE, config.exposure)
+
+        if self.pixel_format != "bgr":
+            # The driver is free to ignore the format, check what actually arrives.
+            try:
+                self.read()
+            except Exception as e:
+                print(f"Camera does not deliver {self.pixel_format} ({e}), falling back to bgr.")
+                # Without resetting the FOURCC the driver would keep sending the raw format, now converted by OpenCV.
+                fourcc = cv2.VideoWriter_fourcc(*config.fourcc) if config.fourcc is not None else original_fourcc
+                self.cap.set(cv2.CAP_PROP_FOURCC, fourcc)
+                self.cap.set(cv2.CAP_PROP_CONVERT_RGB, 1)
+                self.__set_mode()
+                self.pixel_format = "bgr"
+
+    def __set_mode(self):
+        config = self.config
+        # The format has to be set before the resolution, otherwise some drivers reject resolutions the raw format can not do.
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, config.resolution[0])
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, config.resolution[1])
+        if config.fps is not None:
+            self.cap.set(cv2.CAP_PROP_FPS, config.fps)
+
+    def __read_back(self) -> Dict[str, Any]:
+        return {
+            "backend": self.cap.getBackendName(),
+            "resolution": (int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))),
+            "pixel_format": self.pixel_format,
+            "fourcc": fourcc_to_str(self.cap.get(cv2.CAP_PROP_FOURCC)),
+            "fps": self.cap.get(cv2.CAP_PROP_FPS),
+            "buffer_size": self.cap.get(cv2.CAP_PROP_BUFFERSIZE),
+            "exposure": self.cap.get(cv2.CAP_PROP_EXPOSURE),
+        }
+
+    def __verify(self):
+        config = self.config
+        requested = {
+            "resolution": tuple(config.resolution),
+            "pixel_format": config.pixel_format,
+            "fourcc": config.pixel_format.upper() if self.pixel_format != "bgr" else config.fourcc,
+            "fps": config.fps,
+            "buffer_size": config.buffer_size,
+            "exposure": config.exposure,
+        }
+        print(f"Camera {config.source} ({self.accepted['backend']}):")
+        for (name, value) in requested.items():
+            if value is None or self.is_file:
+                print(f"  {name}: {self.accepted[name]}")
+                continue
+            accepted = self.accepted[name]
+            same = accepted == value if not isinstance(value, float) and not isinstance(accepted, float) else abs(accepted - value) < 0.5
+            print(f"  {name}: {accepted}" + ("" if same else f" (asked for {value}, not accepted)"))
+
+    def read(self) -> np.ndarray:
+        """
+        The next frame, in self.pixel_format.
+        """
+        if self.is_file:
+            return self.__read_file()
+        (ok, frame) = self.cap.read()
+        if not ok or frame is None:
+            raise Exception("Could not read from the camera.")
+        if self.pixel_format == "bgr":
+            return frame
+        # Depending on the backend raw frames arrive as one long row.
+        width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        if self.pixel_format == "yuyv":
+            return frame.reshape(height, width, 2)
+        return frame.reshape(height * 3 // 2, width)
+
+    def __read_file(self) -> np.ndarray:
+        # Behave like a camera: a new frame every frame_time, blocking until it is there.
+        now = time.perf_counter()
+        if self.next_frame is not None and now < self.next_frame:
+            time.sleep(self.next_frame - now)
+        self.next_frame = max(now, self.next_frame or now) + self.frame_time
+        (ok, frame) = self.cap.read()
+        if not ok:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            (ok, frame) = self.cap.read()
+            if not ok:
+                raise Exception(f"Could not read from {self.config.source}.")
+        return frame
+
+    def release(self):
+        self.cap.release()
+
+
+def measure(bapture: Bapture, frames: int = 300) -> Dict[str, Any]:
+    """
+    Reads `frames` frames as fast as possible.
+
+    Throughput is frames per second. The read time is how long read() blocked: A fresh frame has to be waited for
+    (~1/fps), reads which return almost immediately got a frame out of the buffer - which was taken before the
+    previous read, i.e. at least one frame old. The share of those is reported as stale.
+    """
+    bapture.read()
+    durations: List[float] = []
+    start = time.perf_counter()
+    for _ in range(frames):
+        t = time.perf_counter()
+        bapture.read()
+        durations.append(time.perf_counter() - t)
+    total = time.perf_counter() - start
+
+    fps = frames / total
+    s = sorted(durations)
+    def percentile(p):
+        return s[min(len(s) - 1, int(len(s) * p))] * 1000
+    stale = len([d for d in durations if d < 0.25 / fps])
+    return {
+        "source": str(bapture.config.source),
+        "accepted": {key: (list(value) if isinstance(value, tuple) else value) for (key, value) in bapture.accepted.items()},
+        "frames": frames,
+        "fps": fps,
+        "read_ms_p50": percentile(0.5),
+        "read_ms_p95": percentile(0.95),
+        "stale_reads": stale / frames,
+    }
+
+
+def main():
+    """
+    python -m lib.bapture [--camera 1 | --camera-file recording.mp4] [--benchmark-output bench.jsonl]
+    Opens the camera like the barser does, prints what the driver accepted and measures capture throughput and latency.
+    """
+    from lib.util.bench import write_bench
+    barameters = Barameters()
+    bapture = Bapture(BaptureConfig.from_barameters(barameters))
+    result = measure(bapture)
+    bapture.release()
+    print(f"{result['fps']:.1f} fps, read p50={result['read_ms_p50']:.1f}ms p95={result['read_ms_p95']:.1f}ms, "
+          f"{result['stale_reads'] * 100:.0f}% stale reads")
+    write_bench(barameters.benchmark_output, "capture", result)
+
+if __name__ == '__main__':
+    main()
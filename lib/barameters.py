@@ -1,9 +1,14 @@
 import argparse
+import os
+from typing import Any, Dict, List, Optional, Union
 import toml
 
 def d(a, b):
     return a if a is not None else b
 
+def optional(convert, a):
+    return convert(a) if a is not None else None
+
 class Barameters:
     fullscreen: bool
     tag_size: int
@@ -11,26 +16,96 @@ class Barameters:
     camera_index: int
     use_joystick: bool
     start_without_barser: bool
+    physics_rate: float
+    physics_max_steps: int
+    frame_pacing: str
+    target_fps: float
+    dirty_rects: bool
+    controller_maps: str
+    measure_latency: bool
+    inject_script: Optional[str]
+    benchmark_output: Optional[str]
+    asset_budget_mb: float
+    barser_shutdown_timeout: float
+    detector_threads: int
+    quad_decimate: Union[float, str]
+    pixel_format: str
+    camera_file: Optional[str]
+    camera_fourcc: Optional[str]
+    camera_fps: Optional[float]
+    camera_buffer_size: Optional[int]
+    camera_exposure: Optional[float]
+    change_threshold: float
+    change_refresh: float
+    # [{source, tags, region}], see BarserCamera
+    cameras: List[Dict[str, Any]]
 
     def __init__(self):
         file_settings = toml.load("bame.toml")
         parser = argparse.ArgumentParser(description='BAME! (von den Machern von Bame)') 
-        parser.add_argument('--fullscreen', dest="fullscreen", action='store_true')
-        parser.add_argument('--no-splash', dest="no_splash", action='store_true')
+        parser.add_argument('--fullscreen', dest="fullscreen", action='store_true', default=None)
+        parser.add_argument('--no-splash', dest="no_splash", action='store_true', default=None)
         parser.add_argument('--tag-size', dest="tag_size")
         parser.add_argument('--camera', dest="camera_index")
-        parser.add_argument('--ignore-barser', dest="ignore_barser", action="store_true")
+        parser.add_argument('--ignore-barser', dest="ignore_barser", action="store_true", default=None)
+        parser.add_argument('--physics-rate', dest="physics_rate")
+        parser.add_argument('--pacing', dest="frame_pacing", choices=["vsync", "fps", "uncapped"])
+        parser.add_argument('--fps', dest="target_fps")
+        parser.add_argument('--dirty-rects', dest="dirty_rects", action="store_true", default=None)
+        parser.add_argument('--measure-latency', dest="measure_latency", action="store_true", default=None)
+        parser.add_argument('--inject', dest="inject_script", help="toml script of synthetic events, see BventInjector")
+        parser.add_argument('--detector-threads', dest="detector_threads")
+        parser.add_argument('--quad-decimate', dest="quad_decimate", help='Decimation of the AprilTag detector or "auto"')
+        parser.add_argument('--pixel-format', dest="pixel_format", choices=["bgr", "yuyv", "nv12"])
+        parser.add_argument('--camera-file', dest="camera_file", help="Video file which is played back instead of using a camera")
+        parser.add_argument('--camera-fourcc', dest="camera_fourcc", help="e.g. MJPG")
+        parser.add_argument('--camera-fps', dest="camera_fps")
+        parser.add_argument('--change-threshold', dest="change_threshold", help="Difference (gray levels) which counts as a change of the table, 0 barses every frame")
+        parser.add_argument('--benchmark-output', dest="benchmark_output", help="Appends startup/benchmark results as json lines to this file")
 
         arg_settings = parser.parse_args()
 
-        merged_settings = {**file_settings, **vars(arg_settings)}
+        # Only arguments which were actually passed override the file settings.
+        merged_settings = {**file_settings, **{key: value for (key, value) in vars(arg_settings).items() if value is not None}}
         print("Merged Settings: ", merged_settings)
 
-        self.fullscreen = d(merged_settings["fullscreen"], False)
-        self.start_without_barser = d(merged_settings["ignore_barser"], False)
-        self.quick_start = d(merged_settings["no_splash"], False)
-        self.tag_size = int(d(merged_settings["tag_size"], 192))
-        self.camera_index = int(d(merged_settings["camera_index"], 0))
+        self.fullscreen = d(merged_settings.get("fullscreen"), False)
+        self.start_without_barser = d(merged_settings.get("ignore_barser"), False)
+        self.quick_start = d(merged_settings.get("no_splash"), False)
+        self.tag_size = int(d(merged_settings.get("tag_size"), 192))
+        self.camera_index = int(d(merged_settings.get("camera_index"), 0))
+        self.physics_rate = float(d(merged_settings.get("physics_rate"), 60))
+        self.physics_max_steps = int(d(merged_settings.get("physics_max_steps"), 5))
+        self.frame_pacing = d(merged_settings.get("frame_pacing"), "fps")
+        self.target_fps = float(d(merged_settings.get("target_fps"), 60))
+        self.dirty_rects = d(merged_settings.get("dirty_rects"), False)
+        self.controller_maps = d(merged_settings.get("controller_maps"), "controllers")
+        self.measure_latency = d(merged_settings.get("measure_latency"), False)
+        self.inject_script = merged_settings.get("inject_script")
+        self.benchmark_output = merged_settings.get("benchmark_output")
+        self.asset_budget_mb = float(d(merged_settings.get("asset_budget_mb"), 128))
+        self.barser_shutdown_timeout = float(d(merged_settings.get("barser_shutdown_timeout"), 1))
+        # Leave some cores to the Bame, otherwise rendering stutters while the barser detects.
+        self.detector_threads = int(d(merged_settings.get("detector_threads"), max(1, (os.cpu_count() or 2) // 2)))
+        quad_decimate = d(merged_settings.get("quad_decimate"), "auto")
+        self.quad_decimate = quad_decimate if quad_decimate == "auto" else float(quad_decimate)
+        self.pixel_format = d(merged_settings.get("pixel_format"), "bgr")
+        self.camera_file = merged_settings.get("camera_file")
+        self.camera_fourcc = merged_settings.get("camera_fourcc")
+        self.camera_fps = optional(float, merged_settings.get("camera_fps"))
+        self.camera_buffer_size = optional(int, d(merged_settings.get("camera_buffer_size"), 1))
+        self.camera_exposure = optional(float, merged_settings.get("camera_exposure"))
+        self.change_threshold = float(d(merged_settings.get("change_threshold"), 8))
+        self.change_refresh = float(d(merged_settings.get("change_refresh"), 5))
+        # Without [[cameras]] there is one camera which looks at the whole screen.
+        self.cameras = merged_settings.get("cameras") or [{
+            "source": self.camera_index,
+            "tags": [0, 1, 2, 3],
+            "region": [0, 0, 1920, 1080],
+        }]
+        # A recording replaces the first camera, the others stay live.
+        if self.camera_file is not None:
+            self.cameras = [dict(self.cameras[0], source=self.camera_file)] + self.cameras[1:]
 
         self.use_joystick = True #Might not work anymore without joy
 
@@ -1,19 +1,27 @@
 from lib.barameters import Barameters
 from multiprocessing import Process, Pipe, connection
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple, Union
 from lib.bicturetaker import Bicturetaker
+from lib.bapture import BaptureConfig
+from lib.bhangebetector import BhangeBetector
+from lib.bayload import Bectangles, Bolygons
 import time
 import cv2
+import numpy as np
+from pymunk.vec2d import Vec2d
 
 
 class BarserMethod:
     """
     the @barser decorator wraps the functions into this class.
     The barser then loops over all members of a BameInstance, looking for fields of this type.
+
+    every_frame: Run on every frame, even if the table did not change. For detectors which filter over time (like the
+                 KalmanRects of the BectangleRetector), they need every frame to follow a moving object.
     """
-    def __init__(self, fun) -> None:
+    def __init__(self, fun, every_frame: bool = False) -> None:
         self.fun = fun
-        pass
+        self.every_frame = every_frame
 
     def run(self, *, undistorted_image, parsed_data, barser_context):
         self.fun(undistorted_image, parsed_data, barser_context)
@@ -25,6 +33,10 @@ class BarserMethod:
     # """
     # return BarserMethod(fun)
  
+# Messages on the control pipe. STOP: main -> worker, ACK: worker -> main as soon as it stopped taking bictures.
+STOP = "STOP"
+ACK = "ACK"
+
 class WorkerPayload:
     """
     The actual payload which is sent from the barser to the main Bame Thread.
@@ -33,16 +45,45 @@ class WorkerPayload:
 
     Fields:
         image: Undistorted image
-        raw_image: Raw image from the camera
+        raw_image: Raw image from the camera (BGR), None if the camera delivers yuyv/nv12
         barsed_info (dict): Result which was generated from the Barsers - containing information about the game field.
+        changed: False if the table did not change since the last payload. The (gated) barser methods did not run then.
+        updated: False if barsed_info is None, the Barser keeps using the previous one. Unchanged frames are still
+                 updated if there are every_frame methods: barsed_info is the previous one plus their results.
     """
-    def __init__(self, raw_image, image, barsed_info):
+    def __init__(self, raw_image, image, barsed_info, changed=True, updated=None):
         self.raw_image = raw_image
         self.image = image
         self.barsed_info = barsed_info
+        self.changed = changed
+        self.updated = changed if updated is None else updated
+
+class BarserCamera:
+    """
+    One camera of the barser. It looks at the `region` (x, y, width, height in screen pixels) of the projection, which is
+    marked by the tags `tag_ids` (bottom left, bottom right, top right, top left).
+    """
+    def __init__(self, capture: BaptureConfig, tag_ids: List[int], region: Tuple[int, int, int, int]) -> None:
+        self.capture = capture
+        self.tag_ids = tag_ids
+        self.region = region
+
+    @staticmethod
+    def all_from_barameters(barameters: Barameters) -> List["BarserCamera"]:
+        cameras = []
+        for camera in barameters.cameras:
+            capture = BaptureConfig.from_barameters(barameters)
+            capture.source = camera["source"]
+            cameras.append(BarserCamera(capture, list(camera["tags"]), tuple(camera["region"])))
+        return cameras
 
 class BarserOptions:
-    camera_index: int
+    cameras: List[BarserCamera]
+    shutdown_timeout: float
+    detector_threads: int
+    quad_decimate: Union[float, str]
+    change_threshold: float
+    change_refresh: float
     def __init__(self) -> None:
         pass
 
@@ -50,7 +91,12 @@ class BarserOptions:
     def from_barameters(barameters: Barameters) -> "BarserOptions":
         # TODO: Make this responsive! (barameters.add_update_handler(...))
         options = BarserOptions()
-        options.camera_index = barameters.camera_index
+        options.cameras = BarserCamera.all_from_barameters(barameters)
+        options.shutdown_timeout = barameters.barser_shutdown_timeout
+        options.detector_threads = barameters.detector_threads
+        options.quad_decimate = barameters.quad_decimate
+        options.change_threshold = barameters.change_threshold
+        options.change_refresh = barameters.change_refresh
         return options
 
 class BarserContext:
@@ -68,8 +114,10 @@ class BarserWorkerArguments:
     """
     Exists to catch type errors when calling Process(... barser_worker) early.
     """
-    def __init__(self, *, pipe_connection: connection.Connection, barser_methods: List[BarserMethod], barser_context: BarserContext, options: BarserOptions):
+    def __init__(self, *, pipe_connection: connection.Connection, control_connection: connection.Connection, barser_methods: List[BarserMethod], barser_context: BarserContext, options: BarserOptions, camera: BarserCamera):
         self.pipe_connection = pipe_connection
+        self.control_connection = control_connection
+        self.camera = camera
         self.barser_methods = barser_methods
         self.barser_context = barser_context
         self.options = options
@@ -83,41 +131,72 @@ def barser_worker(arguments: BarserWorkerArguments):
         Bicturetaker takes and processes image 
           |
           V
-        Barsers are run and create the game field which will be stored in barsed_info
+        BhangeBetector compares it to the image of the last change
+          |
+          V
+        If it changed, Barsers are run and create the game field which will be stored in barsed_info
+        (the every_frame ones run on every frame, on top of the previous barsed_info)
           |
           V
         WorkerBayload is constructed and sent over the pipe
+
+    The control pipe is checked once per bicture, so a STOP is acknowledged within one camera frame.
     """
     running = True
 
-    taker = Bicturetaker(cam_index=arguments.options.camera_index, tag_timeout=1)
+    options = arguments.options
+    camera = arguments.camera
+    # The image is warped to the size of the region, so the barsed coordinates are region pixels.
+    taker = Bicturetaker((camera.region[2], camera.region[3]), capture=camera.capture, tag_ids=camera.tag_ids, tag_timeout=1, nthreads=options.detector_threads, quad_decimate=options.quad_decimate)
+    bhange = BhangeBetector(threshold=options.change_threshold, refresh=options.change_refresh)
+
+    every_frame = [method for method in arguments.barser_methods if method.every_frame]
+    last_info = None
 
     print("[BW] Worker started...")
     while running:
-        if arguments.pipe_connection.poll(0):
-            res = arguments.pipe_connection.recv()
-            if res:
+        if arguments.control_connection.poll(0):
+            if arguments.control_connection.recv() == STOP:
                 running = False
+                arguments.control_connection.send(ACK)
 
         if running:
-            d = taker.take_bicture()
+            # Nobody looks at the raw image, no need to convert it.
+            d = taker.take_bicture(want_raw=False)
             image = d["img"] if "img" in d else None
             barsed_info = None
             if image is not None:
                 # cv2.imshow("DBG", image)
                 # cv2.waitKey(1)
-                barsed_info = {}
-                for method in arguments.barser_methods:
-                    method.run(
-                            undistorted_image=d["img"],
-                            parsed_data=barsed_info,
-                            barser_context=arguments.barser_context
-                            )
-                #Todo. This blocks until someone reads. maybe change that behaviour. Maybe a Queue would be a better option here.
-                arguments.pipe_connection.send(WorkerPayload(raw_image=d["raw"], image=image, barsed_info=barsed_info))
+                # Nothing drawn or moved, the previous results are still right. Except for the every_frame methods,
+                # those run on top of the previous results.
+                changed = bhange.check(image) or last_info is None
+                methods = arguments.barser_methods
+                if changed:
+                    barsed_info = {}
+                elif every_frame:
+                    barsed_info = dict(last_info)
+                    methods = every_frame
+                if barsed_info is not None:
+                    for method in methods:
+                        method.run(
+                                undistorted_image=d["img"],
+                                parsed_data=barsed_info,
+                                barser_context=arguments.barser_context
+                                )
+                    last_info = barsed_info
+                # This blocks until someone reads. While stopping the main process keeps draining the pipe, so it can not get stuck here.
+                try:
+                    arguments.pipe_connection.send(WorkerPayload(raw_image=d.get("raw"), image=image, barsed_info=barsed_info, changed=changed, updated=barsed_info is not None))
+                except (BrokenPipeError, EOFError):
+                    print("[BW] Pipe closed by the Bame, stopping.")
+                    running = False
 
     print("[BW] Worker closing...")
+    print(f"[BW] {bhange.report()}")
+    taker.close()
     arguments.pipe_connection.close()
+    arguments.control_connection.close()
 
 class WorkerHandle:
     """
@@ -125,48 +204,148 @@ class WorkerHandle:
 
     This class does all the multiprocessing magic.
     """
-    def __init__(self, barser_methods: List[BarserMethod], barser_context: BarserContext, options: BarserOptions):
+    def __init__(self, barser_methods: List[BarserMethod], barser_context: BarserContext, options: BarserOptions, camera: BarserCamera):
 
-        pipe_connection, child_pipe = Pipe()
-        process = Process(target=barser_worker, args=(BarserWorkerArguments(pipe_connection=child_pipe, barser_methods=barser_methods, barser_context=barser_context, options=options), ))
+        self.camera = camera
+        # Payloads only go from the worker to the Bame, control messages go both ways on their own pipe.
+        pipe_connection, child_pipe = Pipe(duplex=False)
+        control_connection, child_control = Pipe()
+        process = Process(target=barser_worker, args=(BarserWorkerArguments(pipe_connection=child_pipe, control_connection=child_control, barser_methods=barser_methods, barser_context=barser_context, options=options, camera=camera), ))
         process.start()
+        # The worker has its own copies now. Closing ours makes recv() raise EOFError once the worker is gone.
+        child_pipe.close()
+        child_control.close()
 
         self.pipe_connection = pipe_connection
+        self.control_connection = control_connection
         self.process = process
+        self.stop_sent: Optional[float] = None
 
-    def stop(self):
-        print("Stopping worker")
-        self.pipe_connection.send(True)
-
-        # Read images which remain...
-        print("Waiting for thread to shut down.")
-        while True:
-            try:
-                self.pipe_connection.recv()
-            except EOFError:
-                break
-
+    def send_stop(self):
+        """
+        Sends STOP without waiting. Lets the Barser stop all workers at the same time, stop() then waits.
+        """
+        self.stop_sent = time.perf_counter()
+        try:
+            self.control_connection.send(STOP)
+        except (BrokenPipeError, OSError):
+            # Worker crashed already.
+            pass
+
+    def stop(self, timeout: float) -> Dict[str, Any]:
+        """
+        Stops the worker within `timeout` seconds (plus a bit for killing it):
+        STOP is sent and the data pipe is drained (without unpickling) until the worker exited on its own.
+        If it did not exit in time it is terminated, then killed.
 
-        self.process.join(1)
+        Returns how long it took, whether the STOP was acknowledged and how the worker ended (clean, terminated, killed).
+        """
+        if self.stop_sent is None:
+            self.send_stop()
+        start = self.stop_sent
+        deadline = start + timeout
+        acked_after = None
+
+        while self.process.is_alive() and time.perf_counter() < deadline:
+            self.__drain()
+            if acked_after is None:
+                try:
+                    if self.control_connection.poll(0.005) and self.control_connection.recv() == ACK:
+                        acked_after = time.perf_counter() - start
+                    continue
+                except (EOFError, OSError):
+                    # The worker closed its end (it is exiting) or crashed.
+                    pass
+            # Only waiting for the exit is left. Still draining, the worker might be stuck in send().
+            self.process.join(0.005)
+
+        ended = "clean"
+        if self.process.is_alive():
+            ended = "terminated"
+            self.process.terminate()
+            self.process.join(0.5)
         if self.process.is_alive():
-            print("process.join(1) did not succeed.")
+            ended = "killed"
+            self.process.kill()
+            self.process.join()
+        self.process.join()
+
+        self.pipe_connection.close()
+        self.control_connection.close()
         self.process.close()
+        return {
+            "shutdown_ms": (time.perf_counter() - start) * 1000,
+            "ack_ms": acked_after * 1000 if acked_after is not None else None,
+            "ended": ended,
+        }
+
+    def __drain(self):
+        try:
+            while self.pipe_connection.poll(0):
+                self.pipe_connection.recv_bytes()
+        except (EOFError, OSError):
+            pass
+
+def translate(value: Any, offset: Tuple[int, int]) -> Any:
+    """
+    Moves barsed geometry from region to screen coordinates. Knows the shapes the detectors produce:
+    Bolygons/Bectangles, bolygons ((N, 2) arrays or lists of [x, y]) and rectangles ((center, size, angle) tuples,
+    only the center moves). Everything else is returned unchanged.
+    """
+    if offset == (0, 0) or value is None:
+        return value
+    if isinstance(value, (Bolygons, Bectangles)):
+        return value.translated(offset)
+    if isinstance(value, np.ndarray) and value.ndim == 2 and value.shape[1] == 2:
+        return value + np.array(offset, dtype=value.dtype)
+    if isinstance(value, list):
+        if len(value) == 2 and all(isinstance(v, (int, float)) for v in value):
+            return [value[0] + offset[0], value[1] + offset[1]]
+        return [translate(v, offset) for v in value]
+    if isinstance(value, tuple) and len(value) == 3 and isinstance(value[0], Vec2d):
+        return (value[0] + offset, value[1], value[2])
+    return value
+
+def merge_barsed_info(infos: List[Tuple[Tuple[int, int], Optional[Dict[str, Any]]]]) -> Dict[str, Any]:
+    """
+    Merges the barsed_info of several cameras ((x, y) offset of the region, barsed_info) into one in screen coordinates.
+    Lists, Bolygons and Bectangles are concatenated, for everything else the first camera which has a value wins.
+    """
+    merged: Dict[str, Any] = {}
+    for (offset, info) in infos:
+        for (key, value) in (info or {}).items():
+            value = translate(value, offset)
+            if isinstance(value, (Bolygons, Bectangles)):
+                merged[key] = value if merged.get(key) is None else type(value).concatenate([merged[key], value])
+            elif isinstance(value, list):
+                merged[key] = (merged.get(key) or []) + value
+            elif merged.get(key) is None:
+                merged[key] = value
+    return merged
 
 class BarsedWithTime:
     data: WorkerPayload
     time: float
+    # Counts up whenever the table changed, i.e. the gated barser methods ran. Compare it to the last one you looked
+    # at instead of using data.changed, which only tells about the most recent payload. The results of every_frame
+    # methods change on every payload without bumping it.
+    version: int
 
 class Barser:
     """
     Utility class to spawn a seperate process which then runs the bicture-taking and barsing
     """
 
-    handle: Optional[WorkerHandle]
+    handles: List[WorkerHandle]
     last_barsed: Optional[BarsedWithTime]
+    # Last payload of every camera
+    last_payloads: List[Optional[WorkerPayload]]
     barser_methods: List[BarserMethod]
     def __init__(self, game_instance, *, options: BarserOptions):
-        self.handle = None
+        self.handles = []
         self.last_barsed = None
+        self.last_payloads = []
+        self.version = 0
         self.options = options
         self.barser_context = None
 
@@ -183,32 +362,73 @@ class Barser:
 
     def launch(self):
         """
-        Actually launches the thread. Do not forget to call stop() at the end.
+        Actually launches the worker processes, one per camera. Do not forget to call stop() at the end.
         """
-        self.handle = WorkerHandle(self.barser_methods, self.barser_context, options=self.options)
-        pass
+        self.handles = [WorkerHandle(self.barser_methods, self.barser_context, options=self.options, camera=camera) for camera in self.options.cameras]
+        self.last_payloads = [None] * len(self.handles)
 
     def get_bayload(self) -> Optional[BarsedWithTime]:
         """
-        Last workload sent by the worker process. None if None was received yet.
+        Last workload sent by the worker processes. None until every camera sent something.
+        With several cameras the barsed_info is merged (see merge_barsed_info) and the images are not stitched:
+        `image` and `raw_image` are the ones of the first camera.
+        Payloads which were not updated get the barsed_info of the previous payload, the merge only runs on an update.
         """
-        assert self.handle is not None
+        assert self.handles
         
-        data: Optional[WorkerPayload] = None
-        while self.handle.pipe_connection.poll(0):
-            data = self.handle.pipe_connection.recv()
-
-        if data is not None:
+        received = False
+        changed = False
+        updated = False
+        for (index, handle) in enumerate(self.handles):
+            while handle.pipe_connection.poll(0):
+                data: WorkerPayload = handle.pipe_connection.recv()
+                previous = self.last_payloads[index]
+                if not data.updated and previous is not None:
+                    data.barsed_info = previous.barsed_info
+                changed = changed or data.changed
+                updated = updated or data.updated
+                self.last_payloads[index] = data
+                received = True
+
+        if received and all(payload is not None for payload in self.last_payloads):
+            first = self.last_payloads[0]
+            if len(self.handles) == 1:
+                barsed_info = first.barsed_info
+            elif updated or self.last_barsed is None:
+                barsed_info = merge_barsed_info([
+                    ((handle.camera.region[0], handle.camera.region[1]), payload.barsed_info)
+                    for (handle, payload) in zip(self.handles, self.last_payloads)
+                ])
+            else:
+                barsed_info = self.last_barsed.data.barsed_info
+            if changed or self.last_barsed is None:
+                self.version += 1
             bwt = BarsedWithTime()
-            bwt.data = data
+            bwt.data = WorkerPayload(raw_image=first.raw_image, image=first.image, barsed_info=barsed_info, changed=changed, updated=updated)
             bwt.time = time.time()
+            bwt.version = self.version
             self.last_barsed = bwt
         return self.last_barsed
 
-    def stop(self):
+    def stop(self) -> Dict[str, Any]:
         """
-        Blocks until the worker process terminated.
+        Blocks until the worker processes terminated, at most options.shutdown_timeout seconds (+ killing them).
+        All workers are stopped at the same time. Returns the measurements of WorkerHandle.stop, of the slowest worker.
         """
-        assert self.handle is not None
-        self.handle.stop()
+        assert self.handles
+        for handle in self.handles:
+            handle.send_stop()
+        reports = [handle.stop(self.options.shutdown_timeout) for handle in self.handles]
+        self.handles = []
+        endings = ["clean", "terminated", "killed"]
+        acks = [r["ack_ms"] for r in reports]
+        report = {
+            "shutdown_ms": max(r["shutdown_ms"] for r in reports),
+            "ack_ms": None if None in acks else max(acks),
+            "ended": max((r["ended"] for r in reports), key=endings.index),
+            "workers": len(reports),
+        }
+        ack = f"{report['ack_ms']:.0f}ms" if report["ack_ms"] is not None else "never"
+        print(f"Barser stopped in {report['shutdown_ms']:.0f}ms ({report['ended']}, acknowledged: {ack}).")
+        return report
 
@@ -0,0 +1,120 @@
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+import pygame
+
+# (path, size, alpha). alpha is None for the surface as it was loaded from disk.
+BassetKey = Tuple[str, Optional[Tuple[int, int]], Optional[bool]]
+
+
+def surface_bytes(surface: pygame.Surface) -> int:
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+
+class Bassets:
+    """
+    Cache for images, keyed by (path, size, alpha).
+
+    get() returns surfaces which were converted to the display format (convert() or convert_alpha() if alpha=True),
+    so blitting them does not convert every frame. Converting needs the display, so get() has to be called on the
+    main thread after the window was opened (i.e. in load(), not in __init__).
+
+    prefetch() reads and decodes the files on a background thread, the engine calls it with the `assets` of the next
+    scene while the current one is running. get() then only has to scale and convert.
+
+    All surfaces (decoded and converted ones) count towards the memory budget. When it is exceeded the least recently
+    used ones are evicted - surfaces which are still referenced by a scene stay valid, they are just loaded again the
+    next time somebody asks for them.
+
+    Example::
+
+        assets = ["img/Boodle.png"]
+
+        def load(self, context: LoadContext):
+            self.sprite = context.bassets.get("img/Boodle.png", (96, 96), alpha=True)
+    """
+
+    cache: "OrderedDict[BassetKey, pygame.Surface]"
+
+    def __init__(self, budget_mb: float = 128) -> None:
+        self.budget = int(budget_mb * 1024 * 1024)
+        self.cache = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__lock = threading.Lock()
+
+    def get(self, path: str, size: Optional[Tuple[int, int]] = None, alpha: bool = False) -> pygame.Surface:
+        key = (path, tuple(size) if size is not None else None, alpha)
+        surface = self.__lookup(key)
+        if surface is not None:
+            self.hits += 1
+            return surface
+        self.misses += 1
+
+        surface = self.__raw(path)
+        if size is not None and surface.get_size() != key[1]:
+            # No smoothscale, the AprilTags have to keep their hard edges.
+            surface = pygame.transform.scale(surface, key[1])
+        surface = surface.convert_alpha() if alpha else surface.convert()
+        self.__store(key, surface)
+        return surface
+
+    def prefetch(self, paths: Iterable[str]) -> Optional[threading.Thread]:
+        """
+        Loads the files in a background thread. Returns None if everything is cached already.
+        """
+        missing = [path for path in paths if self.__lookup((path, None, None)) is None]
+        if not missing:
+            return None
+        thread = threading.Thread(target=self.decode, args=(missing, ), name="bassets-prefetch", daemon=True)
+        thread.start()
+        return thread
+
+    def decode(self, paths: Iterable[str]):
+        """
+        Reads and decodes the files right away, on the calling thread. Only file I/O and decoding, so this is safe
+        off the main thread (the SceneLoader calls it from its worker). Failures are printed, get() raises them later.
+        """
+        for path in paths:
+            try:
+                self.__raw(path)
+            except Exception as e:
+                print(f"Prefetching {path} failed: {e}")
+
+    def clear(self):
+        with self.__lock:
+            self.cache.clear()
+            self.bytes = 0
+
+    def __raw(self, path: str) -> pygame.Surface:
+        key = (path, None, None)
+        surface = self.__lookup(key)
+        if surface is None:
+            surface = pygame.image.load(path)
+            self.__store(key, surface)
+        return surface
+
+    def __lookup(self, key: BassetKey) -> Optional[pygame.Surface]:
+        with self.__lock:
+            surface = self.cache.get(key)
+            if surface is not None:
+                self.cache.move_to_end(key)
+            return surface
+
+    def __store(self, key: BassetKey, surface: pygame.Surface):
+        with self.__lock:
+            if key in self.cache:
+                self.bytes -= surface_bytes(self.cache.pop(key))
+            self.cache[key] = surface
+            self.bytes += surface_bytes(surface)
+            # Never evict the surface which was just stored, even if it alone is over budget.
+            while self.bytes > self.budget and len(self.cache) > 1:
+                (_, evicted) = self.cache.popitem(last=False)
+                self.bytes -= surface_bytes(evicted)
+                self.evictions += 1
+
+    def report(self) -> str:
+        return (f"<Bassets {len(self.cache)} surfaces {self.bytes / 1024 / 1024:.1f}/{self.budget / 1024 / 1024:.0f}MB "
+                f"hits={self.hits} misses={self.misses} evictions={self.evictions}>")
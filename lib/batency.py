@@ -0,0 +1,93 @@
+import time
+from typing import Any, Dict, List, Optional
+import pygame
+import toml
+from pygame.event import Event
+from lib.bamepad import BamePadManager, Bvent
+
+
+class BatencyMeter:
+    """
+    Measures the input latency from pumping an event (Bame.handle_events) until the frame which consumed its Bvent
+    got flipped, per controller guid.
+
+    pygame does not expose the SDL timestamp of events, so the clock starts when the event is pumped - or, for events
+    from the BventInjector, when it was posted.
+    """
+
+    samples: Dict[str, List[float]]
+
+    def __init__(self) -> None:
+        self.samples = {}
+
+    def stamp(self, bvent: Bvent, event: Event, now: float):
+        bvent.timestamp = getattr(event, "bame_injected_at", now)
+
+    def frame_flipped(self, bvents: List[Bvent], bamepads: Optional[BamePadManager]):
+        now = time.perf_counter()
+        for bvent in bvents:
+            if bvent.timestamp is None:
+                continue
+            stick = bamepads.of_player(bvent.player) if bamepads is not None else None
+            guid = stick.guid if stick is not None else "unknown"
+            self.samples.setdefault(guid, []).append((now - bvent.timestamp) * 1000)
+
+    def report(self) -> str:
+        lines = ["Input latency (event -> flip) in ms:"]
+        for (guid, samples) in self.samples.items():
+            s = sorted(samples)
+            def percentile(p):
+                return s[min(len(s) - 1, int(len(s) * p))]
+            lines.append(f"  {guid}: n={len(s)} p50={percentile(0.5):.2f} p95={percentile(0.95):.2f} p99={percentile(0.99):.2f} max={s[-1]:.2f}")
+        if not self.samples:
+            lines.append("  No samples.")
+        return "\n".join(lines)
+
+
+class BventInjector:
+    """
+    Posts scripted synthetic events into the pygame event queue, so the input pipeline can be benchmarked without hardware.
+
+    Script (toml)::
+
+        repeat = true
+        [[events]]
+        at = 0.5          # Seconds after the start
+        type = "KEYDOWN"  # Name of the pygame event type
+        key = "K_DOWN"    # Any other attributes. Strings starting with K_ are pygame key constants.
+
+    Keyboard events go through the keyboard emulated joystick. Joystick events need the instance_id of a connected joystick.
+    """
+
+    events: List[Dict[str, Any]]
+
+    def __init__(self, script_path: str) -> None:
+        script = toml.load(script_path)
+        self.events = sorted(script["events"], key=lambda e: e["at"])
+        self.repeat = script.get("repeat", False)
+        self.period = script.get("period", self.events[-1]["at"] + 0.5 if self.events else 1)
+        self.start = None
+        self.index = 0
+
+    def pump(self):
+        now = time.perf_counter()
+        if self.start is None:
+            self.start = now
+        while self.index < len(self.events) and self.events[self.index]["at"] <= now - self.start:
+            pygame.event.post(self.__build(self.events[self.index]))
+            self.index += 1
+        if self.repeat and self.index == len(self.events) and now - self.start >= self.period:
+            self.start += self.period
+            self.index = 0
+
+    @staticmethod
+    def __build(description: Dict[str, Any]) -> Event:
+        attributes = {}
+        for (name, value) in description.items():
+            if name in ("at", "type"):
+                continue
+            if isinstance(value, str) and value.startswith("K_"):
+                value = getattr(pygame, value)
+            attributes[name] = value
+        attributes["bame_injected_at"] = time.perf_counter()
+        return pygame.event.Event(getattr(pygame, description["type"]), attributes)
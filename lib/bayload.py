@@ -0,0 +1,171 @@
+"""
+Typed containers for what the detectors put into barsed_info.
+
+Both keep their geometry in one or two flat arrays, no matter how many strokes are on the table. Pickling them
+(every payload goes through the barser pipe) is a couple of memcpys instead of one object per point. __getstate__
+only stores the raw bytes, so there is no per-array numpy overhead either.
+"""
+from typing import Iterable, Iterator, Optional, Sequence, Tuple
+import numpy as np
+from pymunk.vec2d import Vec2d
+
+
+def stack_offsets(all_offsets: Sequence[np.ndarray]) -> np.ndarray:
+    """
+    Offsets of several flat buffers which are concatenated, as if they were one.
+    """
+    stacked = [np.zeros(1, dtype=np.int32)]
+    start = 0
+    for offsets in all_offsets:
+        stacked.append(offsets[1:] + start)
+        start += int(offsets[-1])
+    return np.concatenate(stacked).astype(np.int32)
+
+
+class Bolygons:
+    """
+    Polygons as one (N, 2) int32 vertex buffer. Polygon i is vertices[offsets[i]:offsets[i + 1]].
+
+    Behaves like the list of polygons it replaces: len(), indexing and iterating give (k, 2) int32 views.
+
+    If the BolygonBetector decomposed the polygons already, `convex` holds the convex parts of all of them (float32
+    vertices, pymunk puts points between pixels) and the parts of polygon i are convex[convex_offsets[i]:convex_offsets[i + 1]].
+    See Bhysics.decompose.
+    """
+    vertices: np.ndarray
+    offsets: np.ndarray
+    convex: Optional["Bolygons"]
+    convex_offsets: Optional[np.ndarray]
+    convex_tolerance: Optional[float]
+
+    def __init__(self, vertices: np.ndarray, offsets: np.ndarray, convex: Optional["Bolygons"] = None,
+                 convex_offsets: Optional[np.ndarray] = None, convex_tolerance: Optional[float] = None) -> None:
+        self.vertices = vertices
+        self.offsets = offsets
+        self.convex = convex
+        self.convex_offsets = convex_offsets
+        self.convex_tolerance = convex_tolerance
+
+    @staticmethod
+    def from_list(polygons: Iterable[np.ndarray], dtype=np.int32) -> "Bolygons":
+        polygons = [np.asarray(polygon, dtype=dtype).reshape(-1, 2) for polygon in polygons]
+        offsets = np.zeros(len(polygons) + 1, dtype=np.int32)
+        if polygons:
+            np.cumsum([len(polygon) for polygon in polygons], out=offsets[1:])
+            vertices = np.concatenate(polygons)
+        else:
+            vertices = np.zeros((0, 2), dtype=dtype)
+        return Bolygons(vertices, offsets)
+
+    def with_convex(self, parts: Sequence[Sequence[np.ndarray]], tolerance: float) -> "Bolygons":
+        """
+        Attaches the convex parts, parts[i] being the ones of polygon i.
+        """
+        self.convex = Bolygons.from_list([part for polygon_parts in parts for part in polygon_parts], dtype=np.float32)
+        self.convex_offsets = np.zeros(len(parts) + 1, dtype=np.int32)
+        if len(parts):
+            np.cumsum([len(polygon_parts) for polygon_parts in parts], out=self.convex_offsets[1:])
+        self.convex_tolerance = tolerance
+        return self
+
+    @staticmethod
+    def concatenate(all_bolygons: Sequence["Bolygons"]) -> "Bolygons":
+        """
+        Keeps the convex parts if all of them have them, decomposed with the same tolerance.
+        """
+        bolygons = Bolygons(np.concatenate([b.vertices for b in all_bolygons]), stack_offsets([b.offsets for b in all_bolygons]))
+        tolerances = {b.convex_tolerance for b in all_bolygons}
+        if len(tolerances) == 1 and None not in tolerances and all(b.convex is not None for b in all_bolygons):
+            bolygons.convex = Bolygons.concatenate([b.convex for b in all_bolygons])
+            bolygons.convex_offsets = stack_offsets([b.convex_offsets for b in all_bolygons])
+            bolygons.convex_tolerance = all_bolygons[0].convex_tolerance
+        return bolygons
+
+    def translated(self, offset: Tuple[int, int]) -> "Bolygons":
+        convex = self.convex.translated(offset) if self.convex is not None else None
+        return Bolygons(self.vertices + np.array(offset, dtype=self.vertices.dtype), self.offsets, convex, self.convex_offsets, self.convex_tolerance)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self.vertices[self.offsets[index]:self.offsets[index + 1]]
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        for index in range(len(self)):
+            yield self.vertices[self.offsets[index]:self.offsets[index + 1]]
+
+    def __getstate__(self):
+        convex = None
+        if self.convex is not None:
+            convex = (self.convex.__getstate__(), self.convex_offsets.tobytes(), self.convex_tolerance)
+        return (self.vertices.dtype.str, self.vertices.tobytes(), self.offsets.tobytes(), convex)
+
+    def __setstate__(self, state):
+        (dtype, vertices, offsets, convex) = state
+        self.vertices = np.frombuffer(vertices, dtype=dtype).reshape(-1, 2)
+        self.offsets = np.frombuffer(offsets, dtype=np.int32)
+        self.convex = None
+        self.convex_offsets = None
+        self.convex_tolerance = None
+        if convex is not None:
+            self.convex = Bolygons.__new__(Bolygons)
+            self.convex.__setstate__(convex[0])
+            self.convex_offsets = np.frombuffer(convex[1], dtype=np.int32)
+            self.convex_tolerance = convex[2]
+
+    def __repr__(self) -> str:
+        return f"<Bolygons {len(self)} polygons, {len(self.vertices)} vertices>"
+
+
+class Bectangles:
+    """
+    Rotated rectangles as one (N, 5) float32 array of center x, center y, width, height, angle (radians).
+
+    Iterating gives the (center, size, angle) tuples of Vec2d the BectangleRetector used to return, which is what
+    rect_to_verts and the apps expect.
+    """
+    rects: np.ndarray
+
+    def __init__(self, rects: np.ndarray) -> None:
+        self.rects = rects
+
+    @staticmethod
+    def from_list(rects: Iterable[Tuple[Vec2d, Vec2d, float]]) -> "Bectangles":
+        rows = [(center[0], center[1], size[0], size[1], angle) for (center, size, angle) in rects]
+        return Bectangles(np.array(rows, dtype=np.float32).reshape(-1, 5))
+
+    @staticmethod
+    def concatenate(all_bectangles: Sequence["Bectangles"]) -> "Bectangles":
+        return Bectangles(np.concatenate([b.rects for b in all_bectangles]))
+
+    def translated(self, offset: Tuple[int, int]) -> "Bectangles":
+        rects = self.rects.copy()
+        rects[:, 0] += offset[0]
+        rects[:, 1] += offset[1]
+        return Bectangles(rects)
+
+    def __len__(self) -> int:
+        return len(self.rects)
+
+    def __getitem__(self, index: int) -> Tuple[Vec2d, Vec2d, float]:
+        (cx, cy, w, h, angle) = self.rects[index].tolist()
+        return (Vec2d(cx, cy), Vec2d(w, h), angle)
+
+    def __iter__(self) -> Iterator[Tuple[Vec2d, Vec2d, float]]:
+        for (cx, cy, w, h, angle) in self.rects.tolist():
+            yield (Vec2d(cx, cy), Vec2d(w, h), angle)
+
+    def __getstate__(self):
+        # In a tuple, pickle skips __setstate__ for an empty (falsy) state.
+        return (self.rects.tobytes(), )
+
+    def __setstate__(self, state):
+        self.rects = np.frombuffer(state[0], dtype=np.float32).reshape(-1, 5)
+
+    def __repr__(self) -> str:
+        return f"<Bectangles {len(self)} rectangles>"
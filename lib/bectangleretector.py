@@ -3,6 +3,7 @@ from typing import List, Tuple
 import cv2
 import numpy as np
 from pymunk.vec2d import Vec2d
+from lib.bayload import Bectangles
 
 
 def extract_colors(image, lower, higher):
@@ -302,8 +303,8 @@ class BectangleRetector:
             self.kalmanrects.push(rect)
         return self.last_rects()
 
-    def last_rects(self):
-        return [r.current() for r in self.kalmanrects.rects]
+    def last_rects(self) -> Bectangles:
+        return Bectangles.from_list(r.current() for r in self.kalmanrects.rects)
 
 
 if __name__ == "__main__":
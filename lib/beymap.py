@@ -1,6 +1,6 @@
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 import pygame
-from lib.bamepad import BamePadManager, Bvent
+from lib.bamepad import VALUE_FROM_EVENT, BamePadManager, Bvent, DispatchKey, JoystickMetadata, dispatch_key, rest_value, unmapped_control
 from lib.barameters import Barameters
 from pygame.event import Event
 
@@ -25,36 +25,167 @@ class PlayerBeyMapping:
             return self.__action_to_control[action]
         return None
 
+    def actions(self) -> List[str]:
+        return list(self.__action_to_control.keys())
+
+def is_active(value: Any) -> bool:
+    """
+    Whether a control value counts as "held" for the pressed/released edges. Axes count once they are pushed halfway.
+    """
+    if isinstance(value, float):
+        return abs(value) > 0.5
+    if isinstance(value, tuple):
+        return any(value)
+    return bool(value)
+
 class BeymapManager:
+    """
+    Maps Bvents to actions and keeps the state of every action for every player.
+
+    The state is a table (one row per player, one column per action) which is updated from the Bvents in
+    Bame.handle_events. Reading it (player_action, pressed, released) never touches the device.
+    """
 
     map: Dict[int,PlayerBeyMapping]
+    # player -> action -> (getter, raw), see JoystickMetadata.compile_control
+    controls: Dict[int, Dict[str, Tuple[Callable[[int], Any], int]]]
+    # action -> column, player -> row
+    columns: Dict[str, int]
+    rows: Dict[int, int]
+    values: List[List[Any]]
+    pressed_bits: List[List[bool]]
+    released_bits: List[List[bool]]
+    # (instance_id, event type, raw) -> (player, control_name, action, value, row, column)
+    dispatch: Dict[DispatchKey, Tuple[int, str, Optional[str], Any, Optional[int], Optional[int]]]
 
     def __init__(self, map: Dict[int, Dict[str, str]], bamepad: BamePadManager, _: Barameters) -> None:
         self.bamepad = bamepad
         self.map = {playernum: PlayerBeyMapping(mapping) for (playernum, mapping) in map.items()}
+        self.controls = {stick.player_num: self.__compile(stick) for stick in self.bamepad.joysticks.values()}
+
+        self.columns = {}
+        for mapping in self.map.values():
+            for action in mapping.actions():
+                if action not in self.columns:
+                    self.columns[action] = len(self.columns)
+        # Players whose controller got unplugged keep their row, at rest, until a controller takes them over again.
+        # Games keep asking for their actions in the meantime.
+        resting = {player: guid for (player, guid) in bamepad.disconnected.items() if player in self.map and player not in self.controls}
+        self.rows = {player: row for (row, player) in enumerate(list(self.controls.keys()) + list(resting.keys()))}
+
+        # Poll the devices once, afterwards everything is kept up to date using the events.
+        self.values = [[None] * len(self.columns) for _ in self.rows]
+        for (player, controls) in self.controls.items():
+            for (action, (getter, raw)) in controls.items():
+                self.values[self.rows[player]][self.columns[action]] = getter(raw)
+        for (player, guid) in resting.items():
+            mapping = self.map[player]
+            for action in mapping.actions():
+                self.values[self.rows[player]][self.columns[action]] = rest_value(guid, mapping.control_for_action(action))
+        self.pressed_bits = [[False] * len(self.columns) for _ in self.rows]
+        self.released_bits = [[False] * len(self.columns) for _ in self.rows]
+        self.__edges: List[Tuple[int, int]] = []
+
+        # Fuse the dispatch table of the BamePadManager with the action mapping, so an event is mapped with one lookup.
+        self.dispatch = {}
+        for (key, (player, control_name, value)) in bamepad.dispatch.items():
+            if player not in self.map:
+                continue
+            action = self.map[player].action_for_control(control_name)
+            row = self.rows.get(player)
+            column = self.columns[action] if action is not None else None
+            self.dispatch[key] = (player, control_name, action, value, row, column)
+
+    def __compile(self, stick: JoystickMetadata) -> Dict[str, Tuple[Callable[[int], Any], int]]:
+        compiled = {}
+        mapping = self.map[stick.player_num]
+        for action in mapping.actions():
+            try:
+                compiled[action] = stick.compile_control(mapping.control_for_action(action))
+            except Exception as e:
+                print(f"Action {action} will always be None for player {stick.player_num}: {e}")
+                compiled[action] = (unmapped_control, -1)
+        return compiled
+
+    def begin_frame(self):
+        """
+        Clears the pressed/released bits of the last frame. Called by Bame before pumping the events.
+        """
+        for (row, column) in self.__edges:
+            self.pressed_bits[row][column] = False
+            self.released_bits[row][column] = False
+        self.__edges.clear()
 
     def action(self, name) -> Dict[int, Any]:
-        return { stick.player_num: stick.get_control(self.map[stick.player_num].control_for_action(name)) for stick in self.bamepad.joysticks.values()}
+        column = self.columns[name]
+        return { player: self.values[row][column] for (player, row) in self.rows.items() }
 
     def player_action(self, player, name) -> Any:
-        stick = self.bamepad.of_player(player)
-        if stick is None:
+        return self.values[self.__row(player)][self.columns[name]]
+
+    def pressed(self, player, name) -> bool:
+        """
+        Whether the action got activated during this frame.
+        """
+        return self.pressed_bits[self.__row(player)][self.columns[name]]
+
+    def released(self, player, name) -> bool:
+        """
+        Whether the action got deactivated during this frame.
+        """
+        return self.released_bits[self.__row(player)][self.columns[name]]
+
+    def __row(self, player) -> int:
+        if player not in self.rows:
             if player == 0:
                 raise Exception(f"And again... Players are 1-based u stupid fuck.")
             raise Exception(f"Tried to get action for Player #{player} but no Bamepad was found for it.")
-        return stick.get_control(self.map[player].control_for_action(name))
+        return self.rows[player]
+
+    def dispatch_event(self, event: Event) -> Optional[Bvent]:
+        """
+        Maps a raw pygame event straight to a Bvent with its action (replaces bamepad.map_event + map_event).
+        """
+        key = dispatch_key(event)
+        if key is None:
+            return None
+        entry = self.dispatch.get(key)
+        if entry is None:
+            self.bamepad.warn_unmapped(key)
+            return None
+        (player, control_name, action, value, row, column) = entry
+        if value is VALUE_FROM_EVENT:
+            value = event.value
+        bvent = Bvent(control_name=control_name, value=value, player=player, type=event.type)
+        bvent.action = action
+        if column is not None and row is not None:
+            self.__update(row, column, value)
+        return bvent
 
     def map_event(self, event: Union[Event, Bvent]) -> Union[Event, Bvent]:
         if isinstance(event, Bvent):
             if event.player in self.map:
                 action = self.map[event.player].action_for_control(event.control_name)
                 event.action = action
+                if action is not None and event.player in self.rows:
+                    self.__update(self.rows[event.player], self.columns[action], event.value)
                 return event
             else:
                 raise Exception(f"Got event from player {event.player} which does not have an action-map.")
 
         return event 
 
+    def __update(self, row: int, column: int, value: Any):
+        was_active = is_active(self.values[row][column])
+        active = is_active(value)
+        self.values[row][column] = value
+        if active and not was_active:
+            self.pressed_bits[row][column] = True
+            self.__edges.append((row, column))
+        if was_active and not active:
+            self.released_bits[row][column] = True
+            self.__edges.append((row, column))
+
 class BeymapRegistrar:
     actions: List[Action]
     player_mappings: Dict[int, Dict[str, str]]
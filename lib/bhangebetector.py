@@ -0,0 +1,101 @@
+import time
+from typing import Optional, Tuple
+import cv2
+import numpy as np
+
+# Pixels (of the downscaled image) per block. At the default scale a block is 64x64 pixels of the warped image.
+BLOCK_SIZE = 16
+# Pixels of the patches within a block which are averaged. Small enough that a thin stroke stands out.
+PATCH_SIZE = 4
+
+
+class BhangeBetector:
+    """
+    Tells whether the table changed since the last time the barser methods ran.
+
+    The warped image is downscaled and converted to grayscale, then compared to the image of the last change block by
+    block: a block is dirty if the mean absolute difference of any of its patches is above `threshold` (gray levels).
+    Camera noise averages out within a patch, a new stroke does not - even a thin one, which would vanish in the mean
+    of a whole block. The reference only moves on a change, so slow
+    changes (a line drawn over several frames) add up until they count.
+
+    threshold: Mean absolute difference of a block which counts as a change. 0 reports every frame as changed.
+    refresh: Seconds after which a frame counts as changed anyway, e.g. to pick up a slow change in lighting.
+    scale: Scale of the compared image.
+    block_size: Size of a block in pixels of the compared image.
+    """
+    def __init__(self, *, threshold: float = 8.0, refresh: float = 5.0, scale: float = 0.25, block_size: int = BLOCK_SIZE) -> None:
+        self.threshold = threshold
+        self.refresh = refresh
+        self.scale = scale
+        self.block_size = block_size
+        self.reference: Optional[np.ndarray] = None
+        self.last_change: Optional[float] = None
+        # Blocks which were different in the last frame that was checked.
+        self.dirty: Optional[np.ndarray] = None
+
+        self.frames = 0
+        self.changes = 0
+
+    def check(self, image: np.ndarray, t: Optional[float] = None) -> bool:
+        """
+        image: Warped BGR image.
+        """
+        t = time.time() if t is None else t
+        self.frames += 1
+        (gray, fresh) = self.__compare(image)
+        changed = fresh or bool(self.dirty.any()) or t - self.last_change >= self.refresh
+
+        if changed:
+            self.changes += 1
+            self.reference = gray
+            self.last_change = t
+        return changed
+
+    def changed_blocks(self, image: np.ndarray, t: Optional[float] = None) -> np.ndarray:
+        """
+        For callers which redo their work per block: Returns the (rows, columns) grid of blocks which changed. Only
+        those blocks of the reference are moved, a slow change in one block still adds up while others change.
+        Block r spans the rows r * height / rows to (r + 1) * height / rows of the image, columns alike.
+        Every `refresh` seconds all blocks are reported, so whatever a block missed (a change below the threshold,
+        a stroke across a block border) is fixed after a while.
+        """
+        t = time.time() if t is None else t
+        self.frames += 1
+        (gray, fresh) = self.__compare(image)
+        if fresh or self.last_change is None or t - self.last_change >= self.refresh:
+            self.dirty = np.ones_like(self.dirty)
+            self.reference = gray
+            self.last_change = t
+        elif self.dirty.any():
+            # Nearest neighbour upscaling of the grid, close enough to the boundaries of the INTER_AREA downscaling.
+            pixels = cv2.resize(self.dirty.astype(np.uint8), (gray.shape[1], gray.shape[0]), interpolation=cv2.INTER_NEAREST)
+            np.copyto(self.reference, gray, where=pixels.astype(bool))
+        if self.dirty.any():
+            self.changes += 1
+        return self.dirty
+
+    def __compare(self, image: np.ndarray) -> Tuple[np.ndarray, bool]:
+        """
+        Sets self.dirty, returns the downscaled image and whether there was no reference to compare to.
+        """
+        small = cv2.resize(image, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        (rows, columns) = self.blocks(gray.shape)
+
+        if self.reference is None or self.reference.shape != gray.shape or self.threshold <= 0:
+            self.dirty = np.ones((rows, columns), dtype=bool)
+            return (gray, self.reference is None or self.reference.shape != gray.shape)
+        difference = cv2.absdiff(gray, self.reference)
+        # INTER_AREA to the patch grid is the mean of every patch, the maximum of those is the one of the block.
+        patches = max(1, self.block_size // PATCH_SIZE)
+        means = cv2.resize(difference, (columns * patches, rows * patches), interpolation=cv2.INTER_AREA)
+        self.dirty = means.reshape(rows, patches, columns, patches).max(axis=(1, 3)) > self.threshold
+        return (gray, False)
+
+    def blocks(self, shape) -> Tuple[int, int]:
+        return (max(1, shape[0] // self.block_size), max(1, shape[1] // self.block_size))
+
+    def report(self) -> str:
+        rate = self.changes / self.frames if self.frames else 0.0
+        return f"<BhangeBetector frames={self.frames} changed={self.changes} ({rate * 100:.1f}%)>"
@@ -0,0 +1,306 @@
+import hashlib
+import math
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+import numpy as np
+
+# pymunk is only imported once a game uses it, the engine and the launcher do not need it.
+if TYPE_CHECKING:
+    import pymunk
+    from pymunk.vec2d import Vec2d
+
+
+def shape_thickness(shape: "pymunk.Shape") -> float:
+    """
+    Rough thickness of a shape, i.e. how far something can travel into it before it is through.
+    For polygons this is 4*area/perimeter: the side of a square, the diameter of a circle. Long thin shapes get up to
+    twice their actual thickness (a w*h rectangle with h << w gives about 2h).
+    """
+    import pymunk
+    if isinstance(shape, pymunk.Poly):
+        vertices = shape.get_vertices()
+        # The shoelace sum is twice the area.
+        twice_area = 0.0
+        perimeter = 0.0
+        for a, b in zip(vertices, vertices[1:] + vertices[:1]):
+            twice_area += a.cross(b)
+            perimeter += (b - a).length
+        if perimeter == 0:
+            return 2 * shape.radius
+        return 2 * abs(twice_area) / perimeter + 2 * shape.radius
+    # Circles and segments
+    return 2 * shape.radius
+
+
+class AdaptiveSubSteps:
+    """
+    Sub-stepping policy which picks the amount of sub-steps per fixed step from the scene instead of using a constant.
+
+    Fast bodies get enough steps to not move further than half of the thinnest thing they could tunnel through
+    (thinnest static shape + their own thinnest shape). Every `contacts_per_step` arbiters add another step so
+    stacked and resting contacts stay stable. The result is clamped to [min_steps, max_steps], so an idle scene
+    costs min_steps while a fast ball next to thin lines gets max_steps.
+    """
+
+    thickness: "Dict[pymunk.Shape, float]"
+
+    def __init__(self, min_steps: int = 2, max_steps: int = 30, *, min_thickness: float = 0.05, contacts_per_step: int = 4) -> None:
+        """
+        min_thickness: Lower bound for the thickness of any shape (in game units). Segments with radius 0 would otherwise be infinitely thin.
+        """
+        self.min_steps = min_steps
+        self.max_steps = max_steps
+        self.min_thickness = min_thickness
+        self.contacts_per_step = contacts_per_step
+        self.thickness = {}
+        self.last_steps = min_steps
+
+    def steps(self, space: "pymunk.Space", dt: float) -> int:
+        import pymunk
+        shapes = space.shapes
+        if len(self.thickness) > 2 * len(shapes):
+            # Shapes were removed (barsed lines are replaced regularly), forget about the old ones.
+            self.thickness = {}
+
+        static_thickness = None
+        for shape in shapes:
+            if shape.body.body_type == pymunk.Body.STATIC:
+                thickness = self.__thickness(shape)
+                if static_thickness is None or thickness < static_thickness:
+                    static_thickness = thickness
+        if static_thickness is None:
+            static_thickness = math.inf
+
+        max_ratio = 0.0
+        arbiters = 0
+        for body in space.bodies:
+            if body.is_sleeping:
+                continue
+            speed = body.velocity.length
+            if speed > 0:
+                body_thickness = min([self.__thickness(shape) for shape in body.shapes], default=math.inf)
+                max_ratio = max(max_ratio, speed / (static_thickness + body_thickness))
+            arbiters += self.__count_arbiters(body)
+
+        steps = math.ceil(2 * max_ratio * dt) + arbiters // self.contacts_per_step
+        self.last_steps = max(self.min_steps, min(self.max_steps, steps))
+        return self.last_steps
+
+    def __thickness(self, shape: "pymunk.Shape") -> float:
+        if shape not in self.thickness:
+            self.thickness[shape] = max(self.min_thickness, shape_thickness(shape))
+        return self.thickness[shape]
+
+    @staticmethod
+    def __count_arbiters(body: "pymunk.Body") -> int:
+        count = [0]
+        def f(_):
+            count[0] += 1
+        body.each_arbiter(f)
+        return count[0]
+
+
+class DecompositionCache:
+    """
+    Convex decompositions (pymunk.autogeometry.convex_decomposition) of polygons, so a drawing which did not change is
+    only decomposed once - not on every refresh of the game and not again when the next game sees the same drawing.
+
+    The key is a hash of the polygon rounded to `quantum` game units plus the tolerance, so a polygon which only
+    jitters by a pixel still hits. When the cache holds `size` decompositions the least recently used one is dropped.
+    """
+
+    entries: "OrderedDict[bytes, List[List[Vec2d]]]"
+
+    def __init__(self, size: int = 1024, quantum: float = 2.0) -> None:
+        self.size = size
+        self.quantum = quantum
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, polygon: Any, tolerance: float) -> bytes:
+        quantized = np.rint(np.asarray(polygon, dtype=np.float64) / self.quantum).astype(np.int32)
+        digest = hashlib.blake2b(quantized.tobytes(), digest_size=16)
+        digest.update(repr(float(tolerance)).encode())
+        return digest.digest()
+
+    def get(self, polygon: Any, tolerance: float) -> "List[List[Vec2d]]":
+        """
+        polygon: (N, 2) array or list of [x, y]. Closed (last point = first point) like the BolygonBetector returns them,
+                 open ones are closed.
+        """
+        key = self.key(polygon, tolerance)
+        parts = self.entries.get(key)
+        if parts is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return parts
+
+        self.misses += 1
+        points = np.asarray(polygon).tolist()
+        if points and points[0] != points[-1]:
+            points.append(points[0])
+        import pymunk.autogeometry
+        parts = pymunk.autogeometry.convex_decomposition(points, tolerance)
+        self.entries[key] = parts
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+        return parts
+
+    def report(self) -> str:
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        return f"<DecompositionCache entries={len(self.entries)}/{self.size} hits={self.hits} misses={self.misses} ({rate * 100:.1f}% hit rate)>"
+
+
+class BhysicsSpace:
+    """
+    A pymunk.Space which was registered at the Bhysics together with the amount of sub-steps it wants per fixed step.
+    """
+    def __init__(self, space: "pymunk.Space", sub_steps: Union[int, AdaptiveSubSteps], before_step: Optional[Callable[[float], None]] = None) -> None:
+        self.space = space
+        self.sub_steps = sub_steps
+        self.before_step = before_step
+
+    def step(self, dt: float):
+        if isinstance(self.sub_steps, AdaptiveSubSteps):
+            sub_steps = self.sub_steps.steps(self.space, dt)
+        else:
+            sub_steps = self.sub_steps
+        sub_dt = dt / sub_steps
+        for _ in range(sub_steps):
+            if self.before_step is not None:
+                self.before_step(sub_dt)
+            self.space.step(sub_dt)
+
+
+class Bhysics:
+    """
+    Fixed-timestep scheduler for all pymunk.Spaces of the current scene.
+
+    Games register their spaces while loading and the engine advances them once per frame before ticking the scene.
+    The frame time is collected in an accumulator which is then drained in steps of exactly 1/rate seconds, so the
+    simulation does not depend on the render framerate. Forces are applied in a before_step callback (see register),
+    bodies which are moved by hand are passed to teleport().
+
+    Example::
+
+    Load Method:
+        self.space = pymunk.Space()
+        context.bhysics.register(self.space, sub_steps=20, before_step=self.apply_forces)
+
+    Tick Method:
+        self.bicturemaker.draw_filled_circle(context.bhysics.position(self.ball), ...)
+    """
+
+    spaces: List[BhysicsSpace]
+    previous: "Dict[pymunk.Body, Tuple[Vec2d, float]]"
+    # Lives as long as the engine, scenes share it.
+    decompositions: DecompositionCache
+
+    def __init__(self, rate: float = 60, max_steps: int = 5) -> None:
+        """
+        rate: Physics steps per second.
+        max_steps: Maximum amount of steps taken per frame. If the frame took longer than that, the remaining time is
+                   dropped instead of being caught up later (no spiral of death after a stall).
+        """
+        self.dt = 1 / rate
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.dropped = 0.0
+        self.spaces = []
+        self.previous = {}
+        self.decompositions = DecompositionCache()
+
+    def register(self, space: "pymunk.Space", sub_steps: Union[int, AdaptiveSubSteps] = 1, before_step: Optional[Callable[[float], None]] = None):
+        """
+        Registers a space which will then be stepped by the engine.
+        sub_steps: Amount of pymunk steps per fixed step. Use more sub-steps for fast objects and thin walls,
+                   or pass an AdaptiveSubSteps to let the engine decide every step.
+        before_step: Called with the step length before every pymunk step. Apply forces here, not in tick: the space
+                     is stepped before the scene ticks and pymunk resets the forces after every step.
+        """
+        self.spaces.append(BhysicsSpace(space, sub_steps, before_step))
+
+    def clear(self):
+        """
+        Forgets all registered spaces. Called by the engine when switching scenes.
+        """
+        self.spaces = []
+        self.previous = {}
+        self.accumulator = 0.0
+
+    def advance(self, seconds: float) -> int:
+        """
+        Adds the frame time to the accumulator and takes as many fixed steps as fit into it.
+        Returns the amount of steps taken.
+        """
+        if not self.spaces:
+            return 0
+
+        self.accumulator += seconds
+        steps = int(self.accumulator / self.dt)
+        if steps > self.max_steps:
+            self.dropped += (steps - self.max_steps) * self.dt
+            self.accumulator -= (steps - self.max_steps) * self.dt
+            steps = self.max_steps
+
+        for step in range(steps):
+            if step == steps - 1:
+                self.__snapshot()
+            for bhysics_space in self.spaces:
+                bhysics_space.step(self.dt)
+            self.accumulator -= self.dt
+        return steps
+
+    def decompose(self, polygons: Iterable, tolerance: float) -> "List[List[Vec2d]]":
+        """
+        Convex parts of all `polygons` (Bolygons or a list of polygons, in game units) for pymunk.Poly.
+        Takes the parts the barser decomposed already (see BolygonBetector) if it used the same tolerance, asks the
+        DecompositionCache otherwise.
+        """
+        if getattr(polygons, "convex", None) is not None and polygons.convex_tolerance == tolerance:
+            from pymunk.vec2d import Vec2d
+            return [[Vec2d(x, y) for (x, y) in part.tolist()] for part in polygons.convex]
+        parts = []
+        for polygon in polygons:
+            parts += self.decompositions.get(polygon, tolerance)
+        return parts
+
+    @property
+    def alpha(self) -> float:
+        """
+        How far the render time is between the last and the next fixed step. [0, 1)
+        """
+        return self.accumulator / self.dt
+
+    def teleport(self, body: "pymunk.Body"):
+        """
+        Call after moving a body by hand (e.g. resetting it), so position() and angle() do not blend the old
+        position with the new one until the next step.
+        """
+        self.previous.pop(body, None)
+
+    def position(self, body: "pymunk.Body") -> "Vec2d":
+        """
+        Position of the body interpolated between the last two fixed steps. Use this for rendering.
+        """
+        if body not in self.previous:
+            return body.position
+        previous, _ = self.previous[body]
+        return previous + (body.position - previous) * self.alpha
+
+    def angle(self, body: "pymunk.Body") -> float:
+        """
+        Angle of the body interpolated between the last two fixed steps. Use this for rendering.
+        """
+        if body not in self.previous:
+            return body.angle
+        _, previous = self.previous[body]
+        return previous + (body.angle - previous) * self.alpha
+
+    def __snapshot(self):
+        self.previous = {}
+        for bhysics_space in self.spaces:
+            for body in bhysics_space.space.bodies:
+                self.previous[body] = (body.position, body.angle)
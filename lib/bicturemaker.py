@@ -1,23 +1,24 @@
-from typing import Tuple
-import numpy as np
+import math
+from typing import Optional, Tuple
 
 import pygame
 import pygame.gfxdraw
 import pygame.draw
-from pymunk import Vec2d
+from pygame.math import Vector2
 
 
 class Bicturemaker:
 
-    TOP_LEFT = Vec2d(0, 0)
-    TOP_CENTER = Vec2d(0.5, 0)
-    TOP_RIGHT = Vec2d(1, 0)
-    CENTER_LEFT = Vec2d(0, 0.5)
-    CENTER = Vec2d(0.5, 0.5)
-    CENTER_RIGHT = Vec2d(1, 0.5)
-    BOTTOM_LEFT = Vec2d(0, 1)
-    BOTTOM_CENTER = Vec2d(0.5, 1)
-    BOTTOM_RIGHT = Vec2d(1, 1)
+    # Screen-side vectors are pygame's, pymunk (and its Vec2d) is only imported once a game uses it.
+    TOP_LEFT = Vector2(0, 0)
+    TOP_CENTER = Vector2(0.5, 0)
+    TOP_RIGHT = Vector2(1, 0)
+    CENTER_LEFT = Vector2(0, 0.5)
+    CENTER = Vector2(0.5, 0.5)
+    CENTER_RIGHT = Vector2(1, 0.5)
+    BOTTOM_LEFT = Vector2(0, 1)
+    BOTTOM_CENTER = Vector2(0.5, 1)
+    BOTTOM_RIGHT = Vector2(1, 1)
 
     resolution: Tuple[int, int]
     origin: Tuple[int, int]
@@ -26,19 +27,24 @@ class Bicturemaker:
     def __init__(self, screen, barameters):
         self.screen = screen
         resolution = screen.get_size()
-        self.resolution = Vec2d(resolution[0], resolution[1])
+        self.resolution = Vector2(resolution[0], resolution[1])
+        # BirtyRects of the current frame if the dirty-rect mode is active. Everything drawn gets marked there.
+        self.dirty = None
 
+    def __mark(self, rect):
+        if self.dirty is not None:
+            self.dirty.mark(rect)
 
     def draw_sprite(self, sprite, center_pos, rotation=0):
-        angle = np.degrees(np.arctan2(rotation.y, rotation.x))
+        angle = math.degrees(math.atan2(rotation.y, rotation.x))
         # actual_position = (position[0] + offset[0], position[1] + offset[1])
         (rotated_image, new_rect) = self.__rot_center(sprite, angle, self.munk2game(center_pos))
-        self.screen.blit(rotated_image, new_rect)
+        self.__mark(self.screen.blit(rotated_image, new_rect))
 
     def draw_text(self, text, position):
         text_position = self.munk2game(position)
-        true_text_position = text_position - Vec2d(text.get_width() / 2, text.get_height() / 2)
-        self.screen.blit(text, true_text_position)
+        true_text_position = text_position - Vector2(text.get_width() / 2, text.get_height() / 2)
+        self.__mark(self.screen.blit(text, true_text_position))
 
     def __rot_center(self, image, angle, center):
         rotated_image = pygame.transform.rotate(image, angle)
@@ -46,49 +52,127 @@ class Bicturemaker:
         return rotated_image, new_rect
 
     def draw_line(self, color, start_pos, end_pos, width=1):
-        pygame.draw.line(self.screen, color, self.munk2game(start_pos), self.munk2game(end_pos), width)
+        self.__mark(pygame.draw.line(self.screen, color, self.munk2game(start_pos), self.munk2game(end_pos), width))
 
     def draw_filled_circle(self, position, radius, color):
         actual_position = self.munk2game(position)
         pygame.gfxdraw.filled_circle(self.screen, int(actual_position.x), int(actual_position.y), int(radius * self.scale), color)
+        self.__mark_circle(actual_position, radius)
 
     def draw_aacircle(self, position, radius, color):
         actual_position = self.munk2game(position)
         pygame.gfxdraw.aacircle(self.screen, int(actual_position.x), int(actual_position.y), int(radius * self.scale), color)
+        self.__mark_circle(actual_position, radius)
+
+    def __mark_circle(self, actual_position, radius):
+        # gfxdraw does not return the rect it touched.
+        if self.dirty is not None:
+            pixel_radius = int(radius * self.scale) + 1
+            self.dirty.mark((int(actual_position.x) - pixel_radius, int(actual_position.y) - pixel_radius, pixel_radius * 2 + 1, pixel_radius * 2 + 1))
 
     def draw_rect(self, color, topleft, bottomright, width=0, border_radius=-1):
         actual_topleft = self.munk2game(topleft)
         actual_bottomright = self.munk2game(bottomright)
         width_height = actual_bottomright - actual_topleft
         rect = pygame.Rect(actual_topleft, width_height)
-        pygame.draw.rect(self.screen, color, rect, int(width * self.scale), int(border_radius * self.scale))
+        self.__mark(pygame.draw.rect(self.screen, color, rect, int(width * self.scale), int(border_radius * self.scale)))
 
     def draw_lines(self, color, closed, points, width=1):
         pygame_points = []
         for point in points:
             pygame_points.append(self.munk2game(point))
-        pygame.draw.lines(self.screen, color, closed, pygame_points, width)
+        self.__mark(pygame.draw.lines(self.screen, color, closed, pygame_points, width))
 
     def draw_polygon(self, color, polygon):
         pygame_vertices = []
         for vertex in polygon.get_vertices():
             pygame_vertices.append(self.munk2game(vertex))
-        pygame.draw.polygon(self.screen, color, pygame_vertices)
+        self.__mark(pygame.draw.polygon(self.screen, color, pygame_vertices))
 
     def draw_polygon_from_game_vertices(self, color, vertices):
         pygame_vertices = []
         for vertex in vertices:
-            pygame_vertices.append(Vec2d(vertex[0], vertex[1]))
-        pygame.draw.polygon(self.screen, color, pygame_vertices)
+            pygame_vertices.append((vertex[0], vertex[1]))
+        self.__mark(pygame.draw.polygon(self.screen, color, pygame_vertices))
+
+    def layer(self) -> "BictureLayer":
+        """
+        Creates an offscreen layer for static geometry. See BictureLayer.
+        """
+        return BictureLayer(self)
+
+    def draw_layer(self, layer: "BictureLayer"):
+        """
+        Composites the layer onto the screen with a single blit (of the region which contains something).
+        """
+        if layer.bounds is not None:
+            self.__mark(self.screen.blit(layer.screen, layer.bounds, layer.bounds))
 
-    def set_origin(self, origin: Vec2d):
-        self.origin = Vec2d(origin.x * self.resolution.x, origin.y * self.resolution.y)
+    def set_origin(self, origin: Vector2):
+        self.origin = Vector2(origin.x * self.resolution.x, origin.y * self.resolution.y)
 
     def set_scale(self, scale: int):
         self.scale = scale * self.screen.get_width()
 
-    def munk2game(self, point: Vec2d):
-        return Vec2d(self.origin.x + point.x * self.scale, self.origin.y - point.y * self.scale)
+    def munk2game(self, point) -> Vector2:
+        return Vector2(self.origin.x + point.x * self.scale, self.origin.y - point.y * self.scale)
 
-    def game2munk(self, point: Vec2d):
+    def game2munk(self, point):
+        from pymunk.vec2d import Vec2d
         return Vec2d((point.x - self.origin.x) / self.scale, (self.origin.y - point.y) / self.scale)
+
+
+class BictureLayer(Bicturemaker):
+    """
+    Offscreen surface with the same drawing methods as the Bicturemaker.
+
+    Use it for geometry which rarely changes (e.g. barsed polygons): Rasterize it once whenever it changes and
+    composite it every frame using Bicturemaker.draw_layer(layer), instead of drawing every stroke every frame.
+    Black is transparent.
+
+    Example::
+
+    When the geometry changes:
+        with self.layer:
+            for line in self.lines:
+                self.layer.draw_polygon((63, 0, 0), line)
+
+    Tick Method:
+        self.bicturemaker.draw_layer(self.layer)
+    """
+
+    bounds: Optional[pygame.Rect]
+
+    def __init__(self, parent: Bicturemaker):
+        surface = pygame.Surface(parent.screen.get_size()).convert()
+        surface.set_colorkey((0, 0, 0), pygame.RLEACCEL)
+        super().__init__(surface, None)
+        self.parent = parent
+        self.bounds = None
+        # The layer tracks what was drawn onto itself, so only that region has to be blitted.
+        self.dirty = self
+
+    def clear(self):
+        """
+        Empties the layer. Takes over the origin and scale of the parent Bicturemaker.
+        """
+        self.origin = self.parent.origin
+        self.scale = self.parent.scale
+        self.screen.fill((0, 0, 0))
+        self.bounds = None
+
+    def mark(self, rect):
+        if rect is None:
+            return
+        if self.bounds is None:
+            self.bounds = pygame.Rect(rect)
+        else:
+            self.bounds.union_ip(rect)
+
+    def __enter__(self) -> "BictureLayer":
+        self.clear()
+        return self
+
+    def __exit__(self, *_):
+        if self.bounds is not None:
+            self.bounds = self.bounds.clip(self.screen.get_rect())
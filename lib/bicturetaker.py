@@ -1,8 +1,36 @@
 import time
 import cv2
-from typing import Dict, List, Tuple
+from typing import Dict, List, Sequence, Tuple, Union
 from pupil_apriltags import Detector
 import numpy as np
+from lib.bapture import Bapture, BaptureConfig, luma, to_bgr
+from lib.bagtracker import TagTracker, set_quad_decimate, tag_pixel_size, tune_quad_decimate
+
+# Full frame searches without all four tags until the decimation is reset and tuned again.
+RETUNE_AFTER = 10
+
+
+def make_detector(family: str, nthreads: int, quad_decimate: float) -> Detector:
+    return Detector(families=family,
+                    nthreads=nthreads,
+                    quad_decimate=quad_decimate,
+                    quad_sigma=0.0,
+                    refine_edges=0,
+                    decode_sharpening=0.25,
+                    debug=0)
+
+
+def destroy_detector(detector: Detector):
+    #======= TODO!!!!!!!!!! ==========
+    # WTF???? 
+    # When manually calling these fuckers everything works.
+    # When just calling del self.detector this crashes on linux.
+    detector.libc.tag16h5_destroy.restype = None
+    detector.libc.tag16h5_destroy(detector.tag_families["tag16h5"])
+    # ========= BIGGER TODO!!!!!!!!!!! ========
+    # This will leak.
+    # detector.libc.apriltag_detector_destroy(detector.tag_detector_ptr)
+    detector.tag_detector_ptr = None
 
 def extrude_corner(center_current: Tuple[int, int], corner: Tuple[int, int]):
     """
@@ -50,65 +78,59 @@ class Smoother:
 
 class Bicturetaker:
 
-    def __init__(self, resolution=(1920, 1080), family='tag16h5', *, cam_index, tag_timeout):
-        self.cap = cv2.VideoCapture(cam_index)
+    def __init__(self, resolution=(1920, 1080), family='tag16h5', *, capture: BaptureConfig, tag_timeout, nthreads=8, quad_decimate: Union[float, str] = 2.0, tag_ids: Sequence[int] = (0, 1, 2, 3)):
+        """
+        nthreads: Threads used by the detector. Keep it below the amount of cores, the Bame has to render as well.
+        quad_decimate: Decimation of the detector or "auto" to pick it from the size of the tags once all four were found.
+        capture: How to open the camera. The size of the warped image is `resolution`, independent of the camera's.
+        tag_ids: Ids of the tags in the bottom left, bottom right, top right and top left corner.
+        """
+        self.cap = Bapture(capture)
         self.resolution = resolution
-        self.cap.set(3, self.resolution[0])
-        self.cap.set(4, self.resolution[1])
-        self.detector = Detector(families=family,
-                        nthreads=8,
-                        quad_decimate=2.0,
-                        quad_sigma=0.0,
-                        refine_edges=0,
-                        decode_sharpening=0.25,
-                        debug=0)
-        self.last_results = None
+        self.pixel_format = self.cap.pixel_format
+        self.auto_decimate = quad_decimate == "auto"
+        self.initial_decimate = 2.0 if self.auto_decimate else float(quad_decimate)
+        self.detector = make_detector(family, nthreads, self.initial_decimate)
+        self.tuned = not self.auto_decimate
+        self.incomplete = 0
+        self.tag_ids = list(tag_ids)
+        self.tracker = TagTracker(self.detector, self.tag_ids)
         self.tag_timeout = tag_timeout
         self.last_read = None
         self.matrix = None
+        # (x1, y1, x2, y2) of the camera image which ends up in the warped image.
+        self.region = None
 
         self.smoother = Smoother()
 
 
-    def take_bicture(self) -> Dict:
+    def take_bicture(self, want_raw: bool = True) -> Dict:
         """
         Takes a 🅱️icture, analyzes it for Apriltags and stretches it.
-        Currently searches for 16h5 tags with IDs 0-3 and stretches it as follows:
+        Searches for the 16h5 tags `tag_ids` (0-3 by default) and stretches it as follows (index in tag_ids):
         +---------------+
         |3             2|
         |               |
         |0             1|
         +---------------+
         This may seem kind of autistic, but pupil-apriltags orders their corners in the same way, so this is more consistent when processing.
+
+        Returns "img" (warped BGR image) once the tags were found and "raw" (BGR camera image). "raw" is only
+        converted for yuyv/nv12 if want_raw is set.
         """
-        _, img = self.cap.read()
-        gray = cv2.cvtColor(img, cv2.COLOR_RGBA2GRAY)
+        frame = self.cap.read()
+        ret = {}
+        if want_raw or self.pixel_format == "bgr":
+            ret["raw"] = to_bgr(frame, self.pixel_format)
 
         t = time.time()
         if self.last_read is None or t - self.last_read >= self.tag_timeout:
             self.last_read = t
-            results = []
-            if self.last_results:
-                for last_result in self.last_results:
-                    x1 = int(min([x for (x, _) in last_result.corners])) - 10
-                    x1 = x1 if x1 >= 0 else 0
-                    x2 = int(max([x for (x, _) in last_result.corners])) + 10
-                    x2 = x2 if x1 < img.shape[1] else img.shape[1]
-                    y1 = int(min([y for (_, y) in last_result.corners])) - 10
-                    y1 = y1 if y1 >= 0 else 0
-                    y2 = int(max([y for (_, y) in last_result.corners])) + 10
-                    y2 = y2 if y2 < img.shape[0] else img.shape[0]
-                    res = self.detector.detect(gray[y1:y2,x1:x2])
-                    if len(res) != 1:
-                        break
-                    for i in range(4):
-                        res[0].corners[i] += (x1, y1)
-                    res[0].center += (x1, y1)
-                    results.append(res[0])
-            if len(results) != 4:
-                results = self.detector.detect(gray)
-
-            results = [result for result in results if result.tag_id in range(4)]
+            # Only needed for the detection, which is skipped most of the time because of the tag_timeout.
+            gray = luma(frame, self.pixel_format)
+            results = self.tracker.track(gray, t)
+            if self.auto_decimate:
+                self.__tune(gray, results)
 
             #for result in results:
             #    cv2.fillPoly(img, np.int32([result.corners]), (255, 255, 255))
@@ -117,53 +139,76 @@ class Bicturetaker:
             if len(results) == 4:
                 actual = np.zeros([4, 2], dtype=np.float32)
                 for result in results:
-                    id = result.tag_id
+                    # Position of the tag (0 = bottom left ...), which is also the index of its outer corner.
+                    id = self.tag_ids.index(result.tag_id)
                     if actual[id][0] != 0 or actual[id][1]:
-                        return { "raw": img }
+                        return ret
                     actual[id] = extrude_corner(result.center, result.corners[id])
 
-                self.last_results = results
-
                 self.smoother.push(actual)
 
+                # Only the part of the camera image inside the tags is converted and warped, so the matrix maps from
+                # that region. Even coordinates, yuyv/nv12 store colour for 2x1/2x2 pixels.
+                points = self.smoother.points()
+                (height, width) = gray.shape[:2]
+                x1 = max(0, int(np.floor(points[:, 0].min())) & ~1)
+                y1 = max(0, int(np.floor(points[:, 1].min())) & ~1)
+                x2 = min(width, (int(np.ceil(points[:, 0].max())) + 1) & ~1)
+                y2 = min(height, (int(np.ceil(points[:, 1].max())) + 1) & ~1)
+                self.region = (x1, y1, x2, y2)
+
                 target = np.float32([
                     [0.0, self.resolution[1]],
                     [self.resolution[0], self.resolution[1]],
                     [self.resolution[0], 0.0],
                     [0.0, 0.0]
                 ])
-                self.matrix = cv2.getPerspectiveTransform(self.smoother.points(), target)
+                self.matrix = cv2.getPerspectiveTransform(np.float32(points - (x1, y1)), target)
         
-        ret = { "raw": img }
         if self.matrix is not None:
-            distorted = cv2.warpPerspective(img, self.matrix, self.resolution)
-            ret["img"] = distorted
-        else:  
-            last_result = None
+            colour = to_bgr(frame, self.pixel_format, self.region)
+            ret["img"] = cv2.warpPerspective(colour, self.matrix, self.resolution)
         return ret
 
+    def __tune(self, gray, results):
+        """
+        Tunes the decimation the first time all four tags were found. If the tags get lost for a while afterwards
+        (e.g. the camera moved away), the decimation is reset and tuned again.
+        """
+        if len(results) == 4:
+            self.incomplete = 0
+            if not self.tuned:
+                size = tag_pixel_size(results)
+                quad_decimate = tune_quad_decimate(self.detector, gray, self.tag_ids, size)
+                print(f"Tags are {size:.0f}px, using quad_decimate={quad_decimate}.")
+                self.tuned = True
+        else:
+            self.incomplete += 1
+            if self.tuned and self.incomplete >= RETUNE_AFTER:
+                print(f"Lost the tags, resetting quad_decimate to {self.initial_decimate}.")
+                set_quad_decimate(self.detector, self.initial_decimate)
+                self.tuned = False
+
+    def close(self):
+        """
+        Releases the camera and the detector. Can be called multiple times, __del__ only calls it if nobody else did.
+        """
+        if self.cap is not None:
+            print(self.tracker.report())
+            self.cap.release()
+            self.cap = None
+        if self.detector is not None:
+            destroy_detector(self.detector)
+            self.detector = None
+
     def __del__(self):
-        #======= TODO!!!!!!!!!! ==========
-        # WTF???? 
-        # When manually calling these fuckers everything works.
-        # When just calling del self.detector this crashes on linux.
-        print("0")
-        self.detector.libc.tag16h5_destroy.restype = None
-        self.detector.libc.tag16h5_destroy(self.detector.tag_families["tag16h5"])
-        print("A")
-        # ========= BIGGER TODO!!!!!!!!!!! ========
-        # This will leak.
-        # self.detector.libc.apriltag_detector_destroy(self.detector.tag_detector_ptr)
-        self.detector.tag_detector_ptr = None
-        print("B")
-        del self.detector
-
-        print("C")
-        self.cap.release()
+        # The constructor might have failed before creating them.
+        if hasattr(self, "cap") and hasattr(self, "detector"):
+            self.close()
 
 
 def main():
-    bt = Bicturetaker(cam_index=1, tag_timeout=1)
+    bt = Bicturetaker(capture=BaptureConfig(1), tag_timeout=1)
     while True:
         d = bt.take_bicture()
 
@@ -0,0 +1,73 @@
+from typing import List, Optional
+import pygame
+
+
+class BirtyRects:
+    """
+    Bookkeeping for the dirty-rectangle render mode.
+
+    Instead of clearing and flipping the whole screen every frame, only the regions which were drawn to in the
+    last frame are restored from a background surface, and only those (plus the ones drawn to in this frame) are
+    pushed to the display using pygame.display.update(rects).
+
+    Static things (AprilTags, borders, ...) are drawn onto the background once by the scene via
+    `draw_background(surface)` and never have to be blitted again.
+
+    Workflow per frame (done by Bame):
+        restore()   -> Paint over last frame's rects with the background
+        scene.tick  -> Scene draws and mark()s every rect it touched
+        flush()     -> Returns the rects for display.update (or None if the whole screen has to be flipped)
+    """
+
+    last: List[pygame.Rect]
+    current: List[pygame.Rect]
+
+    def __init__(self, screen) -> None:
+        self.screen = screen
+        self.last = []
+        self.current = []
+        self.__create_background()
+
+    def __create_background(self):
+        self.background = pygame.Surface(self.screen.get_size()).convert()
+        self.background.fill((0, 0, 0))
+        self.background_stale = True
+        self.full = True
+
+    def reset(self):
+        """
+        Throws away the background. Has to be called when the scene changes or the window got resized.
+        """
+        self.last = []
+        self.current = []
+        self.__create_background()
+
+    def invalidate(self):
+        """
+        The next frame restores and updates the whole screen. Call this after changing the background.
+        """
+        self.full = True
+
+    def mark(self, rect):
+        """
+        Marks a region of the screen as changed. Accepts everything pygame.Rect accepts, None is ignored.
+        """
+        if rect is not None:
+            self.current.append(pygame.Rect(rect))
+
+    def restore(self):
+        if self.full:
+            self.screen.blit(self.background, (0, 0))
+        else:
+            for rect in self.last:
+                self.screen.blit(self.background, rect, rect)
+
+    def flush(self) -> Optional[List[pygame.Rect]]:
+        if self.full:
+            rects = None
+            self.full = False
+        else:
+            rects = self.last + self.current
+        self.last = self.current
+        self.current = []
+        return rects
@@ -1,13 +1,103 @@
+from typing import List, Optional, Tuple
 import cv2
+import numpy as np
+from lib.bhangebetector import BhangeBetector
+from lib.bayload import Bolygons
+from lib.bhysics import DecompositionCache
+
+# (x1, y1, x2, y2), x2/y2 exclusive
+Rect = Tuple[int, int, int, int]
+
+
+def overlaps(a: Rect, b: Rect, margin: int = 0) -> bool:
+    """
+    margin=1 also counts rects which only touch (including diagonally), like neighbouring pixels of a contour.
+    """
+    return a[0] < b[2] + margin and b[0] < a[2] + margin and a[1] < b[3] + margin and b[1] < a[3] + margin
+
+
+def union(a: Rect, b: Rect) -> Rect:
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+def merge_rects(rects: List[Rect]) -> List[Rect]:
+    """
+    Merges touching rects until none touch anymore.
+    """
+    merged: List[Rect] = []
+    for rect in rects:
+        i = 0
+        while i < len(merged):
+            if overlaps(rect, merged[i], 1):
+                rect = union(rect, merged.pop(i))
+                i = 0
+            else:
+                i += 1
+        merged.append(rect)
+    return merged
 
 
 class BolygonBetector:
-    def __init__(self, lower, higher, **kwargs) -> None:
+    """
+    Finds the outlines of everything in the colour range `lower` - `higher` (HSV, hue wraps around if lower > higher).
+
+    With `tile_size` set, the mask and the contours of the previous frame are kept and only the changed part of the
+    image is looked at again:
+    1. A BhangeBetector finds the tiles which changed, only those are segmented again.
+    2. The changed tiles are grown by every old contour touching them (and merged when they touch each other), until
+       no contour crosses their border. That way contours reaching over tile boundaries are found as a whole.
+    3. The old contours inside those regions are dropped and findContours only runs on the regions.
+    When nothing is drawn the cost is the change detection, which is about the cost of downscaling the image.
+    Every `change_refresh` seconds the whole image is segmented again, in case the change detection missed something.
+    """
+
+    # [(bounding rect, simplified contour or None if it was too small)] of the whole image
+    contours: List[Tuple[Rect, Optional[np.ndarray]]]
+
+    def __init__(self, lower, higher, *, tolerance: float = 4.0, tile_size: Optional[int] = None, change_threshold: float = 8.0,
+                 change_refresh: float = 5.0, decompose: Optional[float] = None, **kwargs) -> None:
+        """
+        tolerance: How far (in game units, i.e. screen pixels) the simplified outline may be off the actual one.
+        tile_size: Size of the tiles in pixels. None segments the whole image every time.
+        change_threshold: Mean difference (gray levels) of a tile which counts as a change, see BhangeBetector.
+        change_refresh: Seconds after which the whole image is segmented again.
+        decompose: Tolerance of the convex decomposition. If set, the polygons are decomposed here (in the barser
+                   worker) and Bhysics.decompose uses those parts, so the Bame does not have to.
+        """
         self.lower = lower
         self.higher = higher
-        pass
+        self.tolerance = tolerance
+        self.decompose = decompose
+        self.decompositions = DecompositionCache() if decompose is not None else None
+        self.tile_size = tile_size
+        self.bhange = None
+        if tile_size is not None:
+            scale = 0.25
+            self.bhange = BhangeBetector(threshold=change_threshold, refresh=change_refresh, scale=scale, block_size=max(1, round(tile_size * scale)))
+        self.mask: Optional[np.ndarray] = None
+        self.contours = []
+
+    def betect(self, image) -> Optional[Bolygons]:
+        """
+        Returns the simplified contours, None if there is nothing in the colour range.
+        Every contour is a (N, 2) int32 array of x, y. They are closed (the last point is the first one)
+        and counter-clockwise on screen, as pymunk.autogeometry.convex_decomposition wants them (as a list, .tolist()).
+        The image has to be warped to screen pixels, which is what the barser does.
+        """
+        if self.tile_size is None:
+            self.mask = mask = self.__mask(image)
+            self.contours = self.__find(mask, (0, 0, mask.shape[1], mask.shape[0]))
+        else:
+            self.__update(image)
+        if not self.contours:
+            return None
+        polygons = [contour for (_, contour) in self.contours if contour is not None]
+        bolygons = Bolygons.from_list(polygons)
+        if self.decompose is not None:
+            bolygons.with_convex([self.decompositions.get(polygon, self.decompose) for polygon in polygons], self.decompose)
+        return bolygons
 
-    def betect(self, image):
+    def __mask(self, image):
         img_hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
         if self.lower[0] <= self.higher[0]:
             mask = cv2.inRange(img_hsv, self.lower, self.higher)
@@ -15,18 +105,72 @@ class BolygonBetector:
             mask1 = cv2.inRange(img_hsv, (0, self.lower[1], self.lower[2]), self.higher)
             mask2 = cv2.inRange(img_hsv, self.lower, (179, self.higher[1], self.higher[2]))
             mask = mask1 + mask2
-        contours, _ = cv2.findContours(mask.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        if contours:
-            smooth_contours = []
-            for contour in contours:
-                area = cv2.contourArea(contour)
-                if contour.size < 6 or area < 1:
-                    continue
-                smooth_contour = contour
-                area = cv2.contourArea(contour)
-                while smooth_contour.size >= 24 and smooth_contour.size > area / 32:
-                    smooth_contour = smooth_contour[0::4].astype(int)
-                parsed_contour = [x[0].tolist() for x in reversed(smooth_contour)]
-                smooth_contours.append(parsed_contour)
-            return smooth_contours
-        return None
+        return mask
+
+    def __update(self, image):
+        (height, width) = image.shape[:2]
+        dirty = self.bhange.changed_blocks(image)
+        if self.mask is None or self.mask.shape != (height, width) or dirty.all():
+            self.mask = self.__mask(image)
+            self.contours = self.__find(self.mask, (0, 0, width, height))
+            return
+
+        # The block boundaries of the change detection are only exact up to a pixel of the downscaled image.
+        pad = int(np.ceil(2 / self.bhange.scale))
+        (rows, columns) = dirty.shape
+        regions: List[Rect] = []
+        for (row, column) in zip(*np.nonzero(dirty)):
+            (x1, y1, x2, y2) = tile = (
+                max(0, column * width // columns - pad),
+                max(0, row * height // rows - pad),
+                min(width, (column + 1) * width // columns + pad),
+                min(height, (row + 1) * height // rows + pad),
+            )
+            self.mask[y1:y2, x1:x2] = self.__mask(image[y1:y2, x1:x2])
+            regions.append(tile)
+        if not regions:
+            return
+
+        regions = self.__grow(regions)
+        contours = [entry for entry in self.contours if not any(overlaps(entry[0], region, 1) for region in regions)]
+        for region in regions:
+            contours += self.__find(self.mask, region)
+        self.contours = contours
+
+    def __grow(self, regions: List[Rect]) -> List[Rect]:
+        """
+        The mask outside of the regions did not change, so every set pixel next to a region belongs to an old contour.
+        Growing the regions by all old contours touching them leaves no set pixel next to a region.
+        """
+        regions = merge_rects(regions)
+        grown = True
+        while grown:
+            grown = False
+            for (rect, _) in self.contours:
+                for (i, region) in enumerate(regions):
+                    if overlaps(rect, region, 1) and union(rect, region) != region:
+                        regions[i] = union(rect, region)
+                        grown = True
+            if grown:
+                regions = merge_rects(regions)
+        return regions
+
+    def __find(self, mask, region: Rect) -> List[Tuple[Rect, Optional[np.ndarray]]]:
+        (x1, y1, x2, y2) = region
+        # Copy, older OpenCV versions modify the image and the mask is kept for the next frame.
+        contours, _ = cv2.findContours(mask[y1:y2, x1:x2].copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=(x1, y1))
+        found = []
+        for contour in contours:
+            (x, y, w, h) = cv2.boundingRect(contour)
+            found.append(((x, y, x + w, y + h), self.__simplify(contour)))
+        return found
+
+    def __simplify(self, contour) -> Optional[np.ndarray]:
+        if contour.size < 6 or cv2.contourArea(contour) < 1:
+            return None
+        # Douglas-Peucker, keeps the corners and drops everything within the tolerance.
+        simple = cv2.approxPolyDP(contour, self.tolerance, True)
+        if len(simple) < 3:
+            return None
+        points = simple[::-1, 0]
+        return np.ascontiguousarray(np.concatenate([points, points[:1]]), dtype=np.int32)
@@ -0,0 +1,13 @@
+import json
+import time
+from typing import Any, Dict, Optional
+
+
+def write_bench(path: Optional[str], name: str, data: Dict[str, Any]):
+    """
+    Appends one json line {"bench": name, "time": ..., **data} to the benchmark output (if configured).
+    """
+    if path is None:
+        return
+    with open(path, "a") as f:
+        f.write(json.dumps({"bench": name, "time": time.time(), **data}) + "\n")
@@ -0,0 +1,72 @@
+import importlib
+import threading
+from time import perf_counter
+from typing import List, Optional, Tuple
+
+
+class StartupProfiler:
+    """
+    Collects where the time until the first frame goes.
+
+    Marks are timestamps relative to the creation of the profiler (which happens as soon as `lib` gets imported).
+    Heavy modules are imported in the background using preload() while the splash screen is shown; every import
+    is timed. For a full breakdown of the eager imports use `python -X importtime`.
+    """
+
+    marks: List[Tuple[str, float]]
+    imports: List[Tuple[str, float, str]]
+
+    def __init__(self) -> None:
+        self.start = perf_counter()
+        self.marks = []
+        self.imports = []
+        self.first_frame_at: Optional[float] = None
+        self.__lock = threading.Lock()
+
+    def mark(self, name: str):
+        self.marks.append((name, perf_counter() - self.start))
+
+    def first_frame(self):
+        if self.first_frame_at is None:
+            self.first_frame_at = perf_counter() - self.start
+            self.mark("first frame")
+
+    def timed_import(self, name: str):
+        t = perf_counter()
+        module = importlib.import_module(name)
+        with self.__lock:
+            self.imports.append((name, perf_counter() - t, threading.current_thread().name))
+        return module
+
+    def preload(self, names: List[str]) -> threading.Thread:
+        """
+        Imports the modules one after another in a background thread.
+        """
+        def run():
+            for name in names:
+                try:
+                    self.timed_import(name)
+                except Exception as e:
+                    print(f"Preloading {name} failed: {e}")
+            self.mark("preload done")
+        thread = threading.Thread(target=run, name="preload", daemon=True)
+        thread.start()
+        return thread
+
+    def report(self) -> str:
+        lines = ["Startup:"]
+        for (name, at) in self.marks:
+            lines.append(f"  {at * 1000:8.1f}ms {name}")
+        for (name, duration, thread) in self.imports:
+            lines.append(f"  import {name}: {duration * 1000:.1f}ms ({thread})")
+        return "\n".join(lines)
+
+    def as_dict(self):
+        return {
+            "time_to_first_frame_ms": None if self.first_frame_at is None else self.first_frame_at * 1000,
+            "marks_ms": {name: at * 1000 for (name, at) in self.marks},
+            "imports_ms": {name: duration * 1000 for (name, duration, _) in self.imports},
+        }
+
+
+PROFILER = StartupProfiler()